@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic import BaseSettings, RedisDsn
 
 HASHING_ALGORITHM = 'HS256'
@@ -7,14 +9,72 @@ PAGE_SIZE = 2
 
 K_NEAREST_NEIGHBOURS = 3
 POSTS_SIMILARITY_THRESHOLD = 0.4
+EMBEDDING_INDEX_TTL_SECONDS = 300
+EMBEDDING_BACKFILL_BATCH_SIZE = 256
+SIMILAR_POSTS_EXPIRY_INTERVAL_SECONDS = 3600
+PHOTO_CHUNK_SIZE = 64 * 1024
+# Exported rows are read from the database cursor and sent in batches of this size
+EXPORT_BATCH_SIZE = 1000
+BULK_POSTS_MAX_SIZE = 1000
+COUNTERS_RECONCILIATION_INTERVAL_SECONDS = 3600
+# Browsing history of a user expires a week after the last view
+BROWSING_HISTORY_TTL_SECONDS = 7 * 24 * 60 * 60
+BROWSING_HISTORY_MAX_SIZE = 1000
+BROWSING_HISTORY_SWEEP_INTERVAL_SECONDS = 3600
+BROWSING_HISTORY_SWEEP_BATCH_SIZE = 100
+# Views are written to Redis in batches, see `app.utils.views`
+VIEW_BUFFER_MAX_SIZE = 10000
+VIEW_BUFFER_BATCH_SIZE = 500
+VIEW_BUFFER_FLUSH_INTERVAL_SECONDS = 0.005
+# Caches in the memory of each worker, see `app.utils.cache`
+EMBEDDING_LOCAL_CACHE_SIZE = 10000
+EMBEDDING_LOCAL_CACHE_TTL_SECONDS = 3600
+RESPONSE_LOCAL_CACHE_SIZE = 1000
+RESPONSE_LOCAL_CACHE_TTL_SECONDS = 30
+INVALIDATION_RESUBSCRIBE_INTERVAL_SECONDS = 1
+SEARCH_RESULTS_LIMIT = 20
+# Only this many best full-text matches are ranked by the meaning of the query
+SEARCH_RERANK_CANDIDATES = 100
 MODEL_NAME = 'average_word_embeddings_glove.6B.300d'
 MODEL_DIRECTORY_NAME = f'sbert.net_models_{MODEL_NAME}'
 
+# Bump the version whenever cached embeddings have to be recalculated
+EMBEDDING_CACHE_VERSION = 1
+# Little-endian float32, or float16 ('<f2') to halve the memory used by Redis
+EMBEDDING_CACHE_DTYPE = '<f4'
+
 
 class EnvSettings(BaseSettings):
     redis_url: RedisDsn = 'redis://localhost:6379/0'  # type: ignore
+    # Slower calls to Redis fail, see `app.database.redis`
+    redis_timeout_seconds: float = 0.1
+    redis_pool_min_size: int = 1
+    redis_pool_max_size: int = 10
+    # Redis isn't called for a while after this many failures in a row
+    redis_breaker_failure_threshold: int = 5
+    redis_breaker_reset_seconds: float = 10
     sqlite_url: str = 'sqlite+aiosqlite:///news.db'  # type: ignore
     secret_key: str
+    # Every statement is logged with `echo`, which is only meant for debugging
+    sqlite_echo: bool = False
+    sqlite_journal_mode: str = 'wal'
+    sqlite_synchronous: str = 'normal'
+    # Page cache per connection, negative values are in KiB
+    sqlite_cache_size: int = -64000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_busy_timeout_ms: int = 5000
+    # Reads are served by this many connections, writes always go through one
+    sqlite_read_pool_size: int = 4
+    # `numpy` runs GloVe models without torch, `torch` always uses sentence-transformers
+    embedding_engine: Literal['numpy', 'torch'] = 'numpy'
+    # Model calls of a worker run in this many threads, with a bounded number waiting
+    inference_workers: int = 1
+    inference_queue_size: int = 64
+    # Intra-op threads of torch per worker, the torch default is all cores
+    torch_threads: Optional[int] = None
+    photos_directory: str = 'photos'
+    # Ranked feeds are kept for this long, pages of one feed are read from it
+    feed_snapshot_ttl_seconds: int = 300
 
     class Config:
         case_sensitive = False
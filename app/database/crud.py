@@ -1,13 +1,26 @@
 from datetime import datetime, timedelta
-from random import randint
 from sqlite3 import IntegrityError
-from typing import List, NamedTuple, Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
-from sqlalchemy import func, select
+from sqlalchemy import delete, func, insert, inspect, or_, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
-
-from app.database.models import Comment, Post, User, UserRole
-from app.database.redis import AsyncRedisAdapter
+from sqlalchemy.orm import selectinload, undefer_group
+from sqlalchemy.sql import Select
+
+from app.database.crud_counters import (
+    POSTS_COUNTER,
+    get_comment_count,
+    get_counter,
+    increment_counter,
+)
+from app.database.models import (
+    Comment,
+    Post,
+    PostEmbedding,
+    SimilarPost,
+    User,
+    UserRole,
+)
 from app.utils.common import calculate_total_pages, get_page_size
 
 
@@ -53,24 +66,82 @@ async def create_user(
 
 
 async def create_post(
-    session: AsyncSession, header: str, photo: Optional[bytes], text: str, author: User
+    session: AsyncSession,
+    header: str,
+    photo_hash: Optional[str],
+    text: str,
+    author: User,
 ) -> Post:
-    post = Post(header=header, photo=photo, text=text, author=author)
+    # The author may be loaded by the read-only session of the request
+    post = Post(header=header, photo_hash=photo_hash, text=text, author_id=author.id)
     session.add(post)
     await session.commit()
 
     return post
 
 
+async def create_posts(
+    session: AsyncSession, posts: List[Dict[str, Any]], author: User
+) -> List[int]:
+    if not posts:
+        return []
+
+    # All posts are inserted by one executemany. The transaction holds the write lock
+    # of SQLite from the first row on, so the ids of the posts are the last ones.
+    await session.execute(
+        insert(Post), [{**post, 'author_id': author.id} for post in posts]
+    )
+    last_post_id = (await session.execute(select(func.max(Post.id)))).scalar()
+    await session.execute(increment_counter(POSTS_COUNTER, len(posts)))
+    await session.commit()
+
+    return list(range(last_post_id - len(posts) + 1, last_post_id + 1))
+
+
 async def get_post_by_id(session: AsyncSession, post_id: int) -> Optional[Post]:
-    result = await session.execute(select(Post).filter(Post.id == post_id))
+    result = await session.execute(
+        select(Post)
+        .options(selectinload(Post.author), undefer_group('content'))
+        .filter(Post.id == post_id)
+    )
     return result.scalars().first()
 
 
+async def get_posts_by_ids(session: AsyncSession, posts_ids: List[int]) -> List[Post]:
+    result = await session.execute(
+        select(Post).options(selectinload(Post.author)).filter(Post.id.in_(posts_ids))
+    )
+    id2post = {post.id: post for post in result.scalars().all()}
+    # Keep the order of the requested ids, e.g. the ranking of similar posts
+    return [id2post[post_id] for post_id in posts_ids if post_id in id2post]
+
+
+async def load_posts_content(session: AsyncSession, posts: List[Post]) -> None:
+    # Unloaded attributes of the posts in the session are filled in by a single query
+    posts_ids = [post.id for post in posts if 'text' in inspect(post).unloaded]
+    if posts_ids:
+        await session.execute(
+            select(Post)
+            .options(undefer_group('content'))
+            .filter(Post.id.in_(posts_ids))
+        )
+
+
 async def remove_post_by_id(session: AsyncSession, post_id: int) -> None:
     post = await get_post_by_id(session, post_id)
     if post:
         try:
+            await session.execute(
+                delete(PostEmbedding).filter(PostEmbedding.post_id == post_id)
+            )
+            await session.execute(
+                delete(SimilarPost).filter(
+                    or_(
+                        SimilarPost.post_id == post_id,
+                        SimilarPost.similar_post_id == post_id,
+                    )
+                )
+            )
             await session.delete(post)
             await session.commit()
         except IntegrityError as e:  # pragma: no cover
@@ -88,7 +159,34 @@ async def get_all_posts_for_last_week(session: AsyncSession) -> List[Post]:
 async def get_all_posts_after_date(
     session: AsyncSession, start_date: datetime
 ) -> List[Post]:
-    result = await session.execute(select(Post).filter(Post.posted_at >= start_date))
+    result = await session.execute(
+        select(Post)
+        .options(selectinload(Post.author))
+        .filter(Post.posted_at >= start_date)
+    )
+    return result.scalars().all()
+
+
+async def get_posts_after_cursor(
+    session: AsyncSession, cursor: Tuple[datetime, int], limit: int
+) -> List[Post]:
+    return await get_items_after_cursor(session, select(Post), Post, cursor, limit)
+
+
+async def get_items_after_cursor(
+    session: AsyncSession,
+    query: Select,
+    model: Any,
+    cursor: Tuple[datetime, int],
+    limit: int,
+) -> List[Any]:
+    # Keyset pagination, the position is found by the index instead of skipping rows
+    result = await session.execute(
+        query.options(selectinload(model.author))
+        .filter(tuple_(model.posted_at, model.id) > tuple_(*cursor))
+        .order_by(model.posted_at, model.id)
+        .limit(limit)
+    )
     return result.scalars().all()
 
 
@@ -99,58 +197,27 @@ class PostsOnPage(NamedTuple):
 
 async def get_posts_by_page(session: AsyncSession, page: int) -> PostsOnPage:
     page_size = get_page_size()
-    total_posts = (await session.execute(func.count(Post.id))).scalar()
+    total_posts = await get_counter(session, POSTS_COUNTER)
 
     total_pages = calculate_total_pages(total_posts, page_size)
     if page > total_pages:
         raise InvalidPageNumException()
 
     posts = await session.execute(
-        select(Post).offset((page - 1) * page_size).limit(page_size)
+        select(Post)
+        .options(selectinload(Post.author))
+        .order_by(Post.posted_at, Post.id)
+        .offset((page - 1) * page_size)
+        .limit(page_size)
     )
 
     return PostsOnPage(posts=posts.scalars().all(), total_pages=total_pages)
 
 
-async def update_browsing_history(
-    redis: AsyncRedisAdapter, user_id: int, current_timestamp: float, post_id: int
-) -> None:
-    await redis.zadd(key=user_id, score=current_timestamp, member=post_id)
-
-
-async def get_recently_viewed_posts_for_last_week(
-    session: AsyncSession,
-    redis: AsyncRedisAdapter,
-    user_id: int,
-    current_timestamp: float,
-) -> List[Post]:
-    start_timestamp_week_ago = (
-        datetime.fromtimestamp(current_timestamp) - timedelta(weeks=1)
-    ).timestamp()
-
-    # According to https://stackoverflow.com/a/49773605
-    # Periodically update the cache to keep browsing history only for the last week
-    if randint(1, 5) == 1:  # pragma: no cover
-        await redis.zremrangebyscore(key=user_id, max=start_timestamp_week_ago - 1)
-
-    recently_viewed_posts_ids_encoded = await redis.zrangebyscore(
-        key=user_id, min=start_timestamp_week_ago
-    )
-    recently_viewed_posts_ids = [
-        post_id.decode() for post_id in recently_viewed_posts_ids_encoded
-    ]
-
-    relevant_posts = await session.execute(
-        select(Post).filter(Post.id.in_(recently_viewed_posts_ids))
-    )
-
-    return relevant_posts.scalars().all()
-
-
 async def create_comment(
     session: AsyncSession, text: str, author: User, post: Post
 ) -> Comment:
-    comment = Comment(text=text, author=author, post=post)
+    comment = Comment(text=text, author_id=author.id, post_id=post.id)
     session.add(comment)
     await session.commit()
 
@@ -160,10 +227,21 @@ async def create_comment(
 async def get_all_comments_by_post_id(
     session: AsyncSession, post_id: int
 ) -> List[Comment]:
-    result = await session.execute(select(Comment).filter(Comment.post_id == post_id))
+    result = await session.execute(
+        select(Comment)
+        .options(selectinload(Comment.author))
+        .filter(Comment.post_id == post_id)
+    )
     return result.scalars().all()
 
 
+async def get_comments_by_post_id_after_cursor(
+    session: AsyncSession, post_id: int, cursor: Tuple[datetime, int], limit: int
+) -> List[Comment]:
+    query = select(Comment).filter(Comment.post_id == post_id)
+    return await get_items_after_cursor(session, query, Comment, cursor, limit)
+
+
 class CommentsOnPage(NamedTuple):
     comments: List[Comment]
     total_pages: int
@@ -173,18 +251,19 @@ async def get_comments_by_post_id_and_page(
     session: AsyncSession, post_id: int, page: int
 ) -> CommentsOnPage:
     page_size = get_page_size()
-    total_comments = (
-        await session.execute(
-            select(func.count(Comment.id)).filter(Comment.post_id == post_id)
-        )
-    ).scalar()
+    total_comments = await get_comment_count(session, post_id)
 
     total_pages = calculate_total_pages(total_comments, page_size)
     if page > total_pages:
         raise InvalidPageNumException()
 
     comments = await session.execute(
-        select(Comment).offset((page - 1) * page_size).limit(page_size)
+        select(Comment)
+        .options(selectinload(Comment.author))
+        .filter(Comment.post_id == post_id)
+        .order_by(Comment.posted_at, Comment.id)
+        .offset((page - 1) * page_size)
+        .limit(page_size)
     )
 
     return CommentsOnPage(comments=comments.scalars().all(), total_pages=total_pages)
@@ -200,3 +279,7 @@ class PostNotFoundException(Exception):
 
 class InvalidPageNumException(Exception):
     pass
+
+
+class InvalidCursorException(Exception):
+    pass
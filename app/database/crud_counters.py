@@ -0,0 +1,89 @@
+from typing import Any
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.dialects.sqlite import Insert, insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Update
+
+from app.database.models import Comment, Counter, Post
+
+POSTS_COUNTER = 'posts'
+
+
+def increment_counter(name: str, delta: int) -> Insert:
+    statement = insert(Counter).values(name=name, value=delta)
+    return statement.on_conflict_do_update(
+        index_elements=[Counter.name], set_={'value': Counter.value + delta}
+    )
+
+
+def increment_comment_count(post_id: int, delta: int) -> Update:
+    return (
+        update(Post)
+        .filter(Post.id == post_id)
+        .values(comment_count=Post.comment_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+# Counters are changed by the flush that writes the rows, so they are committed or
+# rolled back together with them. Bulk inserts bypass these events, see `create_posts`.
+@event.listens_for(Post, 'after_insert')
+def count_inserted_post(_: Any, connection: Connection, __: Post) -> None:
+    connection.execute(increment_counter(POSTS_COUNTER, 1))
+
+
+@event.listens_for(Post, 'after_delete')
+def count_deleted_post(_: Any, connection: Connection, __: Post) -> None:
+    connection.execute(increment_counter(POSTS_COUNTER, -1))
+
+
+@event.listens_for(Comment, 'after_insert')
+def count_inserted_comment(_: Any, connection: Connection, comment: Comment) -> None:
+    connection.execute(increment_comment_count(comment.post_id, 1))
+
+
+@event.listens_for(Comment, 'after_delete')
+def count_deleted_comment(_: Any, connection: Connection, comment: Comment) -> None:
+    connection.execute(increment_comment_count(comment.post_id, -1))
+
+
+async def get_counter(session: AsyncSession, name: str) -> int:
+    result = await session.execute(select(Counter.value).filter(Counter.name == name))
+    return result.scalar() or 0
+
+
+async def get_comment_count(session: AsyncSession, post_id: int) -> int:
+    result = await session.execute(
+        select(Post.comment_count).filter(Post.id == post_id)
+    )
+    return result.scalar() or 0
+
+
+async def reconcile_counters(session: AsyncSession) -> None:
+    # Drift, e.g. from rows changed outside of the app, is repaired from the tables
+    total_posts = (
+        await session.execute(select(func.count()).select_from(Post))
+    ).scalar()
+    await session.execute(
+        insert(Counter)
+        .values(name=POSTS_COUNTER, value=total_posts)
+        .on_conflict_do_update(
+            index_elements=[Counter.name], set_={'value': total_posts}
+        )
+    )
+
+    comment_count = (
+        select(func.count())
+        .select_from(Comment)
+        .filter(Comment.post_id == Post.id)
+        .scalar_subquery()
+    )
+    await session.execute(
+        update(Post)
+        .filter(Post.comment_count != comment_count)
+        .values(comment_count=comment_count)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
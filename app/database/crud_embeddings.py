@@ -0,0 +1,177 @@
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
+
+from app.database.models import Post, PostEmbedding, SimilarPost
+
+
+async def get_post_headers(session: AsyncSession, *filters: Any) -> List[Post]:
+    # Recommendations only need headers, neither the content nor the authors
+    result = await session.execute(
+        select(Post).options(load_only(Post.header, Post.posted_at)).filter(*filters)
+    )
+    return result.scalars().all()
+
+
+async def get_post_headers_by_ids(
+    session: AsyncSession, posts_ids: List[Any]
+) -> List[Post]:
+    return await get_post_headers(session, Post.id.in_(posts_ids))
+
+
+async def get_post_headers_after_date(
+    session: AsyncSession, start_date: datetime
+) -> List[Post]:
+    return await get_post_headers(session, Post.posted_at >= start_date)
+
+
+async def get_posts_ids_after_date(
+    session: AsyncSession, start_date: datetime
+) -> List[int]:
+    result = await session.execute(select(Post.id).filter(Post.posted_at >= start_date))
+    return result.scalars().all()
+
+
+async def get_post_embeddings(
+    session: AsyncSession, posts_ids: List[int], model: str
+) -> Dict[int, bytes]:
+    result = await session.execute(
+        select(PostEmbedding.post_id, PostEmbedding.vector).filter(
+            PostEmbedding.post_id.in_(posts_ids), PostEmbedding.model == model
+        )
+    )
+    return dict(result.all())
+
+
+async def save_post_embeddings(
+    session: AsyncSession, vectors: Dict[int, bytes], model: str
+) -> None:
+    if not vectors:
+        return
+
+    statement = insert(PostEmbedding)
+    await session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[PostEmbedding.post_id],
+            set_={
+                'model': statement.excluded.model,
+                'vector': statement.excluded.vector,
+            },
+        ),
+        [
+            {'post_id': post_id, 'model': model, 'vector': vector}
+            for post_id, vector in vectors.items()
+        ],
+    )
+    await session.commit()
+
+
+async def get_posts_without_embeddings(
+    session: AsyncSession, model: str, limit: int, after_id: int = 0
+) -> List[Post]:
+    # Embeddings calculated by another model are treated as missing. Batches go on from
+    # the last post of the previous one, so posts are only read once by a backfill.
+    result = await session.execute(
+        select(Post)
+        .options(load_only(Post.header))
+        .outerjoin(
+            PostEmbedding,
+            and_(PostEmbedding.post_id == Post.id, PostEmbedding.model == model),
+        )
+        .filter(Post.id > after_id, PostEmbedding.post_id.is_(None))
+        .order_by(Post.id)
+        .limit(limit)
+    )
+    return result.scalars().all()
+
+
+async def get_similar_posts(
+    session: AsyncSession, post_id: int, start_date: datetime
+) -> List[Post]:
+    # The primary key starts with `post_id`, so the list is read by a single index seek
+    result = await session.execute(
+        select(Post)
+        .options(selectinload(Post.author))
+        .join(SimilarPost, SimilarPost.similar_post_id == Post.id)
+        .filter(SimilarPost.post_id == post_id, Post.posted_at >= start_date)
+        .order_by(SimilarPost.score.desc())
+    )
+    return result.scalars().all()
+
+
+async def get_posts_ids_listing_similar_post(
+    session: AsyncSession, similar_post_id: int
+) -> List[int]:
+    result = await session.execute(
+        select(SimilarPost.post_id).filter(
+            SimilarPost.similar_post_id == similar_post_id
+        )
+    )
+    return result.scalars().all()
+
+
+async def save_similar_posts(
+    session: AsyncSession, similar_posts: Dict[int, List[Tuple[int, float]]]
+) -> None:
+    # Lists of the given posts are replaced as a whole, empty ones are just removed
+    if not similar_posts:
+        return
+
+    await session.execute(
+        delete(SimilarPost).filter(SimilarPost.post_id.in_(list(similar_posts)))
+    )
+    rows = [
+        {'post_id': post_id, 'similar_post_id': similar_post_id, 'score': score}
+        for post_id, neighbours in similar_posts.items()
+        for similar_post_id, score in neighbours
+    ]
+    if rows:
+        await session.execute(SimilarPost.__table__.insert(), rows)
+    await session.execute(
+        update(Post)
+        .filter(Post.id.in_(list(similar_posts)))
+        .values(similar_posts_calculated=True)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+
+
+async def are_similar_posts_calculated(session: AsyncSession, post_id: int) -> bool:
+    result = await session.execute(
+        select(Post.similar_posts_calculated).filter(Post.id == post_id)
+    )
+    return bool(result.scalar())
+
+
+async def remove_expired_similar_posts(
+    session: AsyncSession, start_date: datetime
+) -> List[int]:
+    expired_posts_ids = select(Post.id).filter(Post.posted_at < start_date)
+
+    # Recent posts that lose a neighbour have to be recalculated afterwards
+    result = await session.execute(
+        select(SimilarPost.post_id)
+        .distinct()
+        .filter(
+            SimilarPost.similar_post_id.in_(expired_posts_ids),
+            SimilarPost.post_id.not_in(expired_posts_ids),
+        )
+    )
+    affected_posts_ids = result.scalars().all()
+
+    await session.execute(
+        delete(SimilarPost)
+        .filter(
+            or_(
+                SimilarPost.post_id.in_(expired_posts_ids),
+                SimilarPost.similar_post_id.in_(expired_posts_ids),
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return affected_posts_ids
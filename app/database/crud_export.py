@@ -0,0 +1,49 @@
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+from sqlalchemy.sql import Select
+
+from app.config import EXPORT_BATCH_SIZE
+from app.database.models import Comment, Post
+
+
+async def stream_rows_since(
+    session: AsyncSession, query: Select, model: Any, since: Optional[datetime]
+) -> AsyncResult:
+    # Plain rows are fetched from a server-side cursor, no ORM objects are kept around
+    if since is not None:
+        query = query.filter(model.posted_at >= since)
+    return await session.stream(
+        query.order_by(model.posted_at, model.id).execution_options(
+            yield_per=EXPORT_BATCH_SIZE
+        )
+    )
+
+
+async def stream_posts_since(
+    session: AsyncSession, since: Optional[datetime]
+) -> AsyncResult:
+    query = select(
+        Post.id,
+        Post.author_id,
+        Post.header,
+        Post.text,
+        Post.photo_hash,
+        Post.posted_at,
+    )
+    return await stream_rows_since(session, query, Post, since)
+
+
+async def stream_comments_since(
+    session: AsyncSession, since: Optional[datetime]
+) -> AsyncResult:
+    query = select(
+        Comment.id,
+        Comment.author_id,
+        Comment.post_id,
+        Comment.text,
+        Comment.posted_at,
+    )
+    return await stream_rows_since(session, query, Comment, since)
@@ -0,0 +1,109 @@
+from contextlib import suppress
+from datetime import datetime, timedelta
+from typing import List, NamedTuple, Sequence
+
+from aioredis import PipelineError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import (
+    BROWSING_HISTORY_MAX_SIZE,
+    BROWSING_HISTORY_SWEEP_BATCH_SIZE,
+    BROWSING_HISTORY_TTL_SECONDS,
+)
+from app.database.crud_embeddings import get_post_headers_by_ids
+from app.database.models import Post
+from app.database.redis import AsyncRedisAdapter
+
+BROWSING_HISTORY_KEY_PREFIX = 'history:'
+
+
+def get_browsing_history_key(user_id: int) -> str:
+    return f'{BROWSING_HISTORY_KEY_PREFIX}{user_id}'
+
+
+class View(NamedTuple):
+    user_id: int
+    timestamp: float
+    post_id: int
+
+
+async def update_browsing_history(
+    redis: AsyncRedisAdapter, user_id: int, current_timestamp: float, post_id: int
+) -> None:
+    await update_browsing_histories(redis, [View(user_id, current_timestamp, post_id)])
+
+
+async def update_browsing_histories(
+    redis: AsyncRedisAdapter, views: Sequence[View]
+) -> int:
+    # Only the latest views are kept, and histories of inactive users expire.
+    # Returns the number of views that failed, the other views are still written.
+    added = []
+    try:
+        async with redis.pipeline() as pipe:
+            for view in views:
+                key = get_browsing_history_key(view.user_id)
+                added.append(pipe.zadd(key, view.timestamp, view.post_id))
+                pipe.zremrangebyrank(key, 0, -BROWSING_HISTORY_MAX_SIZE - 1)
+                pipe.expire(key, BROWSING_HISTORY_TTL_SECONDS)
+    except PipelineError:
+        # Keys holding other types than sorted sets
+        return sum(1 for future in added if future.exception())
+    return 0
+
+
+async def get_recently_viewed_posts_for_last_week(
+    session: AsyncSession,
+    redis: AsyncRedisAdapter,
+    user_id: int,
+    current_timestamp: float,
+) -> List[Post]:
+    start_timestamp_week_ago = (
+        datetime.fromtimestamp(current_timestamp) - timedelta(weeks=1)
+    ).timestamp()
+
+    # Older views are removed by `sweep_browsing_history`
+    recently_viewed_posts_ids_encoded = await redis.zrangebyscore(
+        key=get_browsing_history_key(user_id), min=start_timestamp_week_ago
+    )
+    recently_viewed_posts_ids = [
+        post_id.decode() for post_id in recently_viewed_posts_ids_encoded
+    ]
+
+    return await get_post_headers_by_ids(session, recently_viewed_posts_ids)
+
+
+async def sweep_browsing_history(
+    redis: AsyncRedisAdapter, current_timestamp: float
+) -> None:
+    start_timestamp_week_ago = (
+        datetime.fromtimestamp(current_timestamp) - timedelta(weeks=1)
+    ).timestamp()
+    async for keys in redis.scan(
+        match=f'{BROWSING_HISTORY_KEY_PREFIX}*', count=BROWSING_HISTORY_SWEEP_BATCH_SIZE
+    ):
+        # Keys holding other types are skipped, the rest of the batch is still swept
+        with suppress(PipelineError):
+            await redis.zremrangebyscore_many(keys, max=start_timestamp_week_ago - 1)
+
+
+async def move_browsing_history(
+    redis: AsyncRedisAdapter, key: bytes, new_key: str
+) -> None:
+    # Every worker moves the histories on startup. Keys already moved by another one
+    # fail with a command error, and histories stored under the new key are kept.
+    with suppress(PipelineError):
+        async with redis.pipeline(transaction=True) as transaction:
+            transaction.renamenx(key, new_key)
+            transaction.expire(new_key, BROWSING_HISTORY_TTL_SECONDS)
+
+
+async def move_legacy_browsing_history(redis: AsyncRedisAdapter) -> None:
+    # Histories used to be stored under the bare id of the user
+    async for keys in redis.scan(
+        match='[0-9]*', count=BROWSING_HISTORY_SWEEP_BATCH_SIZE
+    ):
+        for key in keys:
+            if key.isdigit() and await redis.type(key) == b'zset':
+                new_key = get_browsing_history_key(int(key))
+                await move_browsing_history(redis, key, new_key)
@@ -0,0 +1,33 @@
+import re
+from typing import List
+
+from sqlalchemy import Integer, column, func, literal_column, select, table
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.crud import get_posts_by_ids
+from app.database.models import Post
+
+# The full-text index of the posts, see `app.database.sqlite`
+post_search = table('PostSearch', column('rowid', Integer))
+# Matches in headers weigh more than matches in texts
+SEARCH_COLUMN_WEIGHTS = (10.0, 1.0)
+
+
+def to_fts_query(query: str) -> str:
+    # Every word is quoted, so clients can't use or break the syntax of FTS5 queries
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', query))
+
+
+async def search_posts(session: AsyncSession, query: str, limit: int) -> List[Post]:
+    fts_query = to_fts_query(query)
+    if not fts_query:
+        return []
+
+    index = literal_column('PostSearch')
+    result = await session.execute(
+        select(post_search.c.rowid)
+        .filter(index.op('MATCH')(fts_query))
+        .order_by(func.bm25(index, *SEARCH_COLUMN_WEIGHTS))
+        .limit(limit)
+    )
+    return await get_posts_by_ids(session, result.scalars().all())
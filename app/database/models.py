@@ -1,9 +1,20 @@
 import datetime
 from enum import Enum
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, LargeBinary, String, Text
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    Text,
+)
 from sqlalchemy.ext.declarative import DeclarativeMeta, declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import deferred, relationship
 
 Base: DeclarativeMeta = declarative_base()
 
@@ -32,12 +43,23 @@ class Post(Base):
     author_id = Column(Integer, ForeignKey('User.id'))
 
     header = Column(String, nullable=False)
-    photo = Column(LargeBinary, nullable=True)
-    text = Column(Text, nullable=True)
+    # The content is only loaded when it's rendered, see `crud.load_posts_content`
+    # Photos are kept in the photo store, see `app.utils.photos`
+    photo_hash = deferred(Column(String, nullable=True), group='content')
+    text = deferred(Column(Text, nullable=True), group='content')
     posted_at = Column(DateTime, nullable=False, default=datetime.datetime.utcnow)
+    # Maintained on every change of the comments, see `app.database.crud_counters`
+    comment_count = Column(Integer, nullable=False, default=0, server_default='0')
+    # Tells empty lists of similar posts from ones that were never calculated
+    similar_posts_calculated = deferred(
+        Column(Boolean, nullable=False, default=False, server_default='0')
+    )
 
     author = relationship('User')
 
+    # Recent posts are filtered and paginated by the date, ties are broken by the id
+    __table_args__ = (Index('ix_Post_posted_at_id', 'posted_at', 'id'),)
+
 
 class Comment(Base):
     __tablename__ = 'Comment'
@@ -51,3 +73,39 @@ class Comment(Base):
 
     author = relationship('User')
     post = relationship('Post')
+
+    __table_args__ = (
+        Index('ix_Comment_post_id_posted_at_id', 'post_id', 'posted_at', 'id'),
+        # All comments are exported in this order
+        Index('ix_Comment_posted_at_id', 'posted_at', 'id'),
+    )
+
+
+class PostEmbedding(Base):
+    __tablename__ = 'PostEmbedding'
+
+    post_id = Column(Integer, ForeignKey('Post.id'), primary_key=True)
+
+    model = Column(String, nullable=False)
+    vector = Column(LargeBinary, nullable=False)
+
+
+class SimilarPost(Base):
+    __tablename__ = 'SimilarPost'
+
+    post_id = Column(Integer, ForeignKey('Post.id'), primary_key=True)
+    similar_post_id = Column(Integer, ForeignKey('Post.id'), primary_key=True)
+
+    score = Column(Float, nullable=False)
+
+    # Lists that contain a post are found when the post changes
+    __table_args__ = (Index('ix_SimilarPost_similar_post_id', 'similar_post_id'),)
+
+
+# Totals that are maintained on writes instead of being counted on every read
+class Counter(Base):
+    __tablename__ = 'Counter'
+
+    name = Column(String, primary_key=True)
+
+    value = Column(Integer, nullable=False, default=0)
@@ -1,40 +1,173 @@
 # pylint: disable=redefined-builtin
+# pylint: disable=too-many-public-methods
 
-from typing import Any, Optional
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+)
 
-from aioredis import Redis, create_redis_pool
+from aioredis import PipelineError, Redis, RedisError, ReplyError, create_redis_pool
 
 from app.config import settings
 
+T = TypeVar('T')
 
+
+def is_command_error(error: BaseException) -> bool:
+    # Pipelines fail with the errors of their commands, which are connection errors
+    # as well when the connection is lost
+    if isinstance(error, PipelineError):
+        return all(is_command_error(command_error) for command_error in error.args[1])
+    return isinstance(error, ReplyError)
+
+
+# Calls fail fast while Redis is down. After `failure_threshold` failures in a row the
+# breaker opens and calls are rejected without waiting for their timeout. Once
+# `reset_timeout` has passed calls are let through again, and the first failure
+# opens the breaker anew.
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def is_open(self) -> bool:
+        return (
+            self.opened_at is not None
+            and time.monotonic() - self.opened_at < self.reset_timeout
+        )
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+# Every call is bounded by `redis_timeout_seconds`. Timeouts and connection errors
+# are raised as `RedisUnavailableError`, callers fall back to degraded answers then.
 class AsyncRedisAdapter:
     def __init__(self, pool: Optional[Redis] = None) -> None:
         self.redis: Any = pool
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.redis_breaker_failure_threshold,
+            reset_timeout=settings.redis_breaker_reset_seconds,
+        )
 
     async def init(self) -> None:
-        self.redis = self.redis or await create_redis_pool(settings.redis_url)
+        self.redis = self.redis or await create_redis_pool(
+            settings.redis_url,
+            minsize=settings.redis_pool_min_size,
+            maxsize=settings.redis_pool_max_size,
+            timeout=settings.redis_timeout_seconds,
+        )
+
+    @property
+    def is_available(self) -> bool:
+        return not self.breaker.is_open
+
+    async def _execute(
+        self, command: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any
+    ) -> T:
+        if self.breaker.is_open:
+            raise RedisUnavailableError()
+        try:
+            result = await asyncio.wait_for(
+                command(*args, **kwargs), timeout=settings.redis_timeout_seconds
+            )
+        except (asyncio.TimeoutError, RedisError, OSError) as e:
+            if is_command_error(e):
+                # Errors of the commands themselves mean that Redis is up
+                self.breaker.record_success()
+                raise
+            self.breaker.record_failure()
+            raise RedisUnavailableError() from e
+        self.breaker.record_success()
+        return result
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[Any]:
+        # Commands of the block are sent in one round trip when it exits, they return
+        # futures that are awaited afterwards. A transaction also runs them atomically.
+        if self.breaker.is_open:
+            raise RedisUnavailableError()
+        pipe = self.redis.multi_exec() if transaction else self.redis.pipeline()
+        yield pipe
+        await self._execute(pipe.execute)
+
+    async def scan(self, match: str, count: int) -> AsyncIterator[List[Any]]:
+        # Keys are yielded in batches of about `count`, unlike KEYS it doesn't block Redis
+        cursor = 0
+        while True:
+            cursor, keys = await self._execute(
+                self.redis.scan, cursor, match=match, count=count
+            )
+            if keys:
+                yield keys
+            if not cursor:
+                break
+
+    async def type(self, key: Any) -> Any:
+        return await self._execute(self.redis.type, key)
 
     async def exists(self, key: Any) -> bool:
-        return await self.redis.exists(key)
+        return await self._execute(self.redis.exists, key)
 
     async def get(self, key: Any) -> Any:
-        return await self.redis.get(key)
+        return await self._execute(self.redis.get, key)
 
-    async def set(self, key: Any, value: Any) -> Any:
-        return await self.redis.set(key, value)
+    async def mget(self, keys: Sequence[Any]) -> List[Any]:
+        if not keys:
+            return []
+        return await self._execute(self.redis.mget, *keys)
 
-    async def zadd(self, key: Any, score: Any, member: Any) -> Any:
-        return await self.redis.zadd(key, score, member)
+    async def mset(self, mapping: Dict[Any, Any]) -> Any:
+        if not mapping:
+            return None
+        return await self._execute(self.redis.mset, mapping)
+
+    async def lrange(self, key: Any, start: int, stop: int) -> List[Any]:
+        return await self._execute(self.redis.lrange, key, start, stop)
 
     async def zrangebyscore(
         self, key: Any, min: Any = float('-inf'), max: Any = float('inf')
     ) -> Any:
-        return await self.redis.zrangebyscore(key, min, max)
+        return await self._execute(self.redis.zrangebyscore, key, min, max)
 
     async def zremrangebyscore(
         self, key: Any, min: Any = float('-inf'), max: Any = float('inf')
     ) -> Any:
-        return await self.redis.zremrangebyscore(key, min, max)
+        return await self._execute(self.redis.zremrangebyscore, key, min, max)
+
+    async def zremrangebyscore_many(
+        self, keys: Sequence[Any], min: Any = float('-inf'), max: Any = float('inf')
+    ) -> List[Any]:
+        async with self.pipeline() as pipe:
+            futures = [pipe.zremrangebyscore(key, min, max) for key in keys]
+        return [await future for future in futures]
+
+    async def publish(self, channel: str, message: Any) -> Any:
+        return await self._execute(self.redis.publish, channel, message)
+
+    async def subscribe(self, channel: str) -> Any:
+        # Messages are read with `async for message in channel.iter()`
+        (subscription,) = await self._execute(self.redis.subscribe, channel)
+        return subscription
 
     async def close(self) -> None:
         self.redis.close()
@@ -42,3 +175,7 @@ class AsyncRedisAdapter:
 
 
 redis = AsyncRedisAdapter()
+
+
+class RedisUnavailableError(Exception):
+    pass
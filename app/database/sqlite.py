@@ -1,36 +1,151 @@
 from contextlib import asynccontextmanager
-from typing import Any, AsyncIterator
+from typing import Any, AsyncIterator, List
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.schema import CreateColumn
 
 from app.config import settings
 from app.database.models import Base
 
+# Full-text index of the posts, it reads the content from `Post` itself and is kept
+# in sync by triggers, so bulk inserts and deletes are covered too
+POST_SEARCH_TABLE_DDL = (
+    'CREATE VIRTUAL TABLE PostSearch USING fts5('
+    "header, text, content='Post', content_rowid='id', tokenize='porter unicode61')"
+)
+POST_SEARCH_TRIGGERS_DDL = [
+    'CREATE TRIGGER IF NOT EXISTS PostSearch_insert AFTER INSERT ON Post BEGIN '
+    'INSERT INTO PostSearch(rowid, header, text) '
+    'VALUES (new.id, new.header, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS PostSearch_delete AFTER DELETE ON Post BEGIN '
+    'INSERT INTO PostSearch(PostSearch, rowid, header, text) '
+    "VALUES ('delete', old.id, old.header, old.text); END",
+    'CREATE TRIGGER IF NOT EXISTS PostSearch_update '
+    'AFTER UPDATE OF header, text ON Post BEGIN '
+    'INSERT INTO PostSearch(PostSearch, rowid, header, text) '
+    "VALUES ('delete', old.id, old.header, old.text); "
+    'INSERT INTO PostSearch(rowid, header, text) '
+    'VALUES (new.id, new.header, new.text); END',
+]
 
+
+def get_sqlite_pragmas(read_only: bool) -> List[str]:
+    pragmas = [
+        f'journal_mode = {settings.sqlite_journal_mode}',
+        f'synchronous = {settings.sqlite_synchronous}',
+        f'cache_size = {settings.sqlite_cache_size}',
+        f'mmap_size = {settings.sqlite_mmap_size}',
+        f'busy_timeout = {settings.sqlite_busy_timeout_ms}',
+    ]
+    if read_only:
+        pragmas.append('query_only = ON')
+    return pragmas
+
+
+def create_sqlite_engine(pool_size: int, read_only: bool) -> AsyncEngine:
+    engine = create_async_engine(
+        settings.sqlite_url,
+        echo=settings.sqlite_echo,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+    )
+    pragmas = get_sqlite_pragmas(read_only)
+
+    @event.listens_for(engine.sync_engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection: Any, _: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f'PRAGMA {pragma}')
+        cursor.close()
+
+    return engine
+
+
+# With WAL, readers don't block the writer and each other. Reads are served by a pool
+# of read-only connections, while all writes go through a single connection.
 class AsyncSQLiteDBService:
     def __init__(self) -> None:
         self.engine: Any = None
+        self.read_engine: Any = None
         self.async_session: Any = None
+        self.async_read_session: Any = None
 
     async def init(self) -> None:
-        self.engine = create_async_engine(settings.sqlite_url, echo=True)
+        self.engine = create_sqlite_engine(pool_size=1, read_only=False)
+        self.read_engine = create_sqlite_engine(
+            pool_size=settings.sqlite_read_pool_size, read_only=True
+        )
         self.async_session = sessionmaker(
             bind=self.engine,
             class_=AsyncSession,
             autoflush=False,
             expire_on_commit=False,
         )
+        self.async_read_session = sessionmaker(
+            bind=self.read_engine,
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False,
+        )
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(self.create_missing_columns)
+            await conn.run_sync(self.create_missing_indexes)
+            await conn.run_sync(self.create_search_index)
+
+    @staticmethod
+    def create_missing_columns(conn: Connection) -> None:
+        # Columns added later to existing tables have to be nullable or have a default
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing_columns = {
+                column['name'] for column in inspector.get_columns(table.name)
+            }
+            for column in table.columns:
+                if column.name not in existing_columns:
+                    definition = CreateColumn(column).compile(dialect=conn.dialect)
+                    conn.exec_driver_sql(
+                        f'ALTER TABLE "{table.name}" ADD COLUMN {definition}'
+                    )
+
+    @staticmethod
+    def create_missing_indexes(conn: Connection) -> None:
+        # `create_all` skips existing tables, so indexes added later are created here
+        inspector = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            existing_indexes = {
+                index['name'] for index in inspector.get_indexes(table.name)
+            }
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+
+    @staticmethod
+    def create_search_index(conn: Connection) -> None:
+        if not inspect(conn).has_table('PostSearch'):
+            conn.exec_driver_sql(POST_SEARCH_TABLE_DDL)
+            # Posts added before the index existed
+            conn.exec_driver_sql(
+                "INSERT INTO PostSearch(PostSearch) VALUES ('rebuild')"
+            )
+        for trigger_ddl in POST_SEARCH_TRIGGERS_DDL:
+            conn.exec_driver_sql(trigger_ddl)
 
     async def close(self) -> None:
         async with self.engine.begin() as conn:
+            await conn.exec_driver_sql('DROP TABLE IF EXISTS PostSearch')
             await conn.run_sync(Base.metadata.drop_all)
+        await self.read_engine.dispose()
+        await self.engine.dispose()
 
     @asynccontextmanager
-    async def create_session(self) -> AsyncIterator[Any]:
-        new_session = self.async_session()
+    async def create_session(self, read_only: bool = False) -> AsyncIterator[Any]:
+        new_session = self.async_read_session() if read_only else self.async_session()
         try:
             yield new_session
             await new_session.commit()
@@ -44,5 +159,9 @@ class AsyncSQLiteDBService:
         async with self.create_session() as session:
             yield session
 
+    async def get_read_session(self) -> AsyncSession:
+        async with self.create_session(read_only=True) as session:
+            yield session
+
 
 db = AsyncSQLiteDBService()
@@ -1,12 +1,30 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
 
-from app.routers import auth, comments, posts, users
+from app.routers import auth, comments, export, health, photos, posts, search, users
+from app.utils.executor import InferenceQueueFullError
+
+
+async def inference_queue_full_handler(
+    _: Request, __: InferenceQueueFullError
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={'detail': 'Too many requests to the model, try again later'},
+        headers={'Retry-After': '1'},
+    )
 
 
 def create_app() -> FastAPI:
     app = FastAPI()
+    app.include_router(health.router)
     app.include_router(auth.router)
     app.include_router(users.router)
+    # `/posts/search` has to be matched before `/posts/{post_id}`
+    app.include_router(search.router)
     app.include_router(posts.router)
     app.include_router(comments.router)
+    app.include_router(photos.router)
+    app.include_router(export.router)
+    app.add_exception_handler(InferenceQueueFullError, inference_queue_full_handler)
     return app
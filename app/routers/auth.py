@@ -15,7 +15,7 @@ router = APIRouter()
 @router.post('/token', response_model=TokenResponseModel)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: AsyncSession = Depends(db.get_session),
+    session: AsyncSession = Depends(db.get_read_session),
 ) -> TokenResponseModel:
     user = await authenticate_user(session, form_data.username, form_data.password)
     if not user:
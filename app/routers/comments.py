@@ -1,14 +1,19 @@
+# pylint: disable=too-many-arguments
+
 from typing import Optional
 
 from fastapi import APIRouter, Depends, Form, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.crud import (
+    InvalidCursorException,
     InvalidPageNumException,
     create_comment,
     get_all_comments_by_post_id,
+    get_comments_by_post_id_after_cursor,
     get_comments_by_post_id_and_page,
 )
+from app.database.crud_embeddings import get_posts_ids_listing_similar_post
 from app.database.models import User
 from app.database.sqlite import db
 from app.schema import (
@@ -19,7 +24,17 @@ from app.schema import (
     UserResponseModel,
 )
 from app.utils.auth import get_current_active_user
-from app.utils.common import get_post_or_throw_not_found_exception
+from app.utils.cache import (
+    invalidate,
+    post_response_cache,
+    similar_posts_response_cache,
+)
+from app.utils.common import (
+    decode_keyset_cursor,
+    get_next_keyset_cursor,
+    get_page_size,
+    get_post_or_throw_not_found_exception,
+)
 
 router = APIRouter()
 
@@ -37,6 +52,13 @@ async def add_new_comment(
 ) -> CommentLightResponseModel:
     post = await get_post_or_throw_not_found_exception(session, post_id)
     comment = await create_comment(session, text, author=current_user, post=post)
+    # The number of comments of the post has changed, it's also shown in the lists of
+    # similar posts that contain it
+    await invalidate(post_response_cache, [post.id])
+    await invalidate(
+        similar_posts_response_cache,
+        await get_posts_ids_listing_similar_post(session, post.id),
+    )
 
     return CommentLightResponseModel(
         id=comment.id, author_id=current_user.id, post_id=post.id
@@ -47,21 +69,38 @@ async def add_new_comment(
 async def get_comments(
     post_id: int,
     page: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None),
     _: User = Depends(get_current_active_user),
-    session: AsyncSession = Depends(db.get_session),
+    session: AsyncSession = Depends(db.get_read_session),
 ) -> CommentsPaginatedResponseModel:
+    next_cursor = None
     try:
-        if not page:
-            comments = await get_all_comments_by_post_id(session, post_id)
-            total_pages = 1
-        else:
+        if cursor:
+            # One more comment is read to know whether there is a next page
+            page_size = get_page_size()
+            comments = await get_comments_by_post_id_after_cursor(
+                session, post_id, decode_keyset_cursor(cursor), limit=page_size + 1
+            )
+            next_cursor = get_next_keyset_cursor(
+                comments[:page_size], has_more=len(comments) > page_size
+            )
+            comments, total_pages = comments[:page_size], None
+        elif page:
             comments, total_pages = await get_comments_by_post_id_and_page(
                 session, post_id, page
             )
+            next_cursor = get_next_keyset_cursor(comments, has_more=page < total_pages)
+        else:
+            comments = await get_all_comments_by_post_id(session, post_id)
+            total_pages = 1
     except InvalidPageNumException as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail='Page number is too big'
         ) from e
+    except InvalidCursorException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail='Cursor is invalid'
+        ) from e
 
     return CommentsPaginatedResponseModel(
         comments=[
@@ -78,6 +117,7 @@ async def get_comments(
             )
             for comment in comments
         ],
-        page=page or 1,
+        page=None if cursor else page or 1,
         total_pages=total_pages,
+        next_cursor=next_cursor,
     )
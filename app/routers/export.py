@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.models import User, UserRole
+from app.database.sqlite import db
+from app.utils.auth import get_current_active_user
+from app.utils.export import export_comments, export_posts
+from app.utils.responses import ChunkedResponse
+
+router = APIRouter()
+
+
+async def get_current_admin(
+    session: AsyncSession = Depends(db.get_read_session),
+    current_user: User = Depends(get_current_active_user),
+) -> User:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='Only admins can export data',
+        )
+
+    # The session of the auth check would be held until the body is sent, the stream
+    # reads through its own, so it is released before
+    await session.close()
+    return current_user
+
+
+# Incremental syncs pass the `posted_at` of the last exported row as `since`
+@router.get('/export/posts')
+async def export_all_posts(
+    since: Optional[datetime] = Query(None),
+    _: User = Depends(get_current_admin),
+) -> ChunkedResponse:
+    return ChunkedResponse(export_posts(since), media_type='application/x-ndjson')
+
+
+@router.get('/export/comments')
+async def export_all_comments(
+    since: Optional[datetime] = Query(None),
+    _: User = Depends(get_current_admin),
+) -> ChunkedResponse:
+    return ChunkedResponse(export_comments(since), media_type='application/x-ndjson')
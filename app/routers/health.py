@@ -0,0 +1,39 @@
+from fastapi import APIRouter
+
+from app.database.redis import redis
+from app.schema import CacheStatsModel, HealthResponseModel, ViewBufferStatsModel
+from app.utils.cache import caches
+from app.utils.ml import model
+from app.utils.views import view_buffer
+
+router = APIRouter()
+
+
+@router.get('/health', response_model=HealthResponseModel)
+async def get_health() -> HealthResponseModel:
+    # The service is up as soon as it starts, the model may still be warming up.
+    # It stays up while Redis is down, with degraded feeds.
+    return HealthResponseModel(
+        status='ok',
+        model_ready=model.is_loaded,
+        redis_available=redis.is_available,
+        view_buffer=ViewBufferStatsModel(
+            buffered=len(view_buffer),
+            flushed=view_buffer.flushed,
+            overflowed=view_buffer.overflowed,
+            dropped=view_buffer.dropped,
+        ),
+        caches={
+            name: CacheStatsModel(
+                size=len(cache),
+                hits=cache.hits,
+                misses=cache.misses,
+                hit_rate=(
+                    cache.hits / (cache.hits + cache.misses)
+                    if cache.hits + cache.misses
+                    else None
+                ),
+            )
+            for name, cache in caches.items()
+        },
+    )
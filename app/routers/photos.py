@@ -0,0 +1,63 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response, status
+
+from app.utils.photos import (
+    guess_photo_media_type,
+    parse_range,
+    photo_store,
+    read_photo_chunks,
+)
+from app.utils.responses import ChunkedResponse
+
+router = APIRouter()
+
+
+# Photos are public, their URLs can't be guessed and are used in `<img>` tags
+@router.get('/photos/{photo_hash}')
+async def get_photo(
+    photo_hash: str,
+    range_header: Optional[str] = Header(None, alias='Range'),
+    if_none_match: Optional[str] = Header(None),
+) -> Response:
+    path = photo_store.find(photo_hash)
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail='Photo was not found'
+        )
+
+    # Stored photos never change, so their hash is a strong validator
+    etag = f'"{photo_hash}"'
+    headers = {
+        'ETag': etag,
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'public, max-age=31536000, immutable',
+    }
+    if if_none_match and (
+        if_none_match.strip() == '*'
+        or etag in [tag.strip() for tag in if_none_match.split(',')]
+    ):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    size = path.stat().st_size
+    try:
+        byte_range = parse_range(range_header, size) if range_header else None
+    except ValueError:
+        return Response(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={**headers, 'Content-Range': f'bytes */{size}'},
+        )
+
+    first, last = byte_range or (0, size - 1)
+    headers['Content-Length'] = str(last - first + 1)
+    if byte_range:
+        headers['Content-Range'] = f'bytes {first}-{last}/{size}'
+    # The photo is sent as it's read, it's never loaded into memory at once
+    return ChunkedResponse(
+        read_photo_chunks(path, first, last),
+        media_type=guess_photo_media_type(path),
+        status_code=(
+            status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK
+        ),
+        headers=headers,
+    )
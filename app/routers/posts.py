@@ -1,39 +1,65 @@
-import asyncio
+# pylint: disable=too-many-arguments
+
 import datetime
-import itertools
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, Query, status
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    File,
+    Form,
+    HTTPException,
+    Query,
+    Request,
+    status,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database.crud import (
+    InvalidCursorException,
     InvalidPageNumException,
     PostNotFoundException,
     create_post,
+    create_posts,
     get_all_posts_for_last_week,
+    get_posts_after_cursor,
     get_posts_by_page,
-    get_recently_viewed_posts_for_last_week,
-    remove_post_by_id,
-    update_browsing_history,
 )
 from app.database.models import User, UserRole
-from app.database.redis import redis
 from app.database.sqlite import db
 from app.schema import (
+    PostBulkResultModel,
     PostHeavyResponseModel,
     PostLightResponseModel,
+    PostsBulkResponseModel,
     PostsPaginatedResponseModel,
     SuccessResponseModel,
-    UserResponseModel,
 )
 from app.utils.auth import get_current_active_user
+from app.utils.bulk import InvalidBulkPostsException, NewPost, parse_bulk_posts
+from app.utils.cache import (
+    invalidate,
+    post_response_cache,
+    similar_posts_response_cache,
+)
 from app.utils.common import (
-    base64_optional_encode,
-    calculate_total_pages,
+    decode_keyset_cursor,
+    get_next_keyset_cursor,
     get_page_size,
     get_post_or_throw_not_found_exception,
+    get_posts_response,
+    parse_post_fields,
+    select_post_fields,
 )
-from app.utils.ml import find_similar_recent_posts
+from app.utils.feed import get_feed_page
+from app.utils.photos import get_photo_hash, save_photo, save_photos
+from app.utils.similar_posts import (
+    add_posts_to_similar_posts,
+    get_similar_recent_posts,
+    remove_post_and_update_similar_posts,
+)
+from app.utils.views import view_buffer
 
 router = APIRouter()
 
@@ -42,6 +68,7 @@ router = APIRouter()
     '/posts', status_code=status.HTTP_201_CREATED, response_model=PostLightResponseModel
 )
 async def add_new_post(
+    background_tasks: BackgroundTasks,
     photo: Optional[bytes] = File(None),
     header: str = Form(...),
     text: str = Form(...),
@@ -54,110 +81,153 @@ async def add_new_post(
             detail='Only admins can add new posts',
         )
 
-    post = await create_post(session, header, photo, text, author=current_user)
+    # As for bulk uploads, the photo is only written once the post is committed
+    post = await create_post(
+        session, header, get_photo_hash(photo), text, author=current_user
+    )
+    await save_photo(photo)
+    # Calculate the embedding and similar posts once on the write path, not on reads
+    background_tasks.add_task(add_posts_to_similar_posts, [post.id])
 
     return PostLightResponseModel(id=post.id)
 
 
-@router.get('/posts/recent', response_model=PostsPaginatedResponseModel)
+@router.post(
+    '/posts/bulk',
+    status_code=status.HTTP_201_CREATED,
+    response_model=PostsBulkResponseModel,
+)
+async def add_new_posts(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(db.get_session),
+) -> PostsBulkResponseModel:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail='Only admins can add new posts',
+        )
+    try:
+        items = await parse_bulk_posts(request)
+    except InvalidBulkPostsException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=str(e)
+        ) from e
+
+    new_posts = [item for item in items if isinstance(item, NewPost)]
+    # Photos are named by their hash, so they are only written once the posts are
+    # committed and a failed insert leaves no files behind
+    posts_ids = await create_posts(
+        session,
+        [
+            {
+                'header': post.header,
+                'text': post.text,
+                'photo_hash': get_photo_hash(post.photo),
+            }
+            for post in new_posts
+        ],
+        author=current_user,
+    )
+    await save_photos([post.photo for post in new_posts if post.photo])
+    # Headers of the whole batch are encoded by a single call of the model
+    background_tasks.add_task(add_posts_to_similar_posts, posts_ids)
+
+    created_posts_ids = iter(posts_ids)
+    return PostsBulkResponseModel(
+        posts=[
+            (
+                PostBulkResultModel(id=next(created_posts_ids), error=None)
+                if isinstance(item, NewPost)
+                else PostBulkResultModel(id=None, error=item)
+            )
+            for item in items
+        ]
+    )
+
+
+@router.get(
+    '/posts/recent',
+    response_model=PostsPaginatedResponseModel,
+    response_model_exclude_unset=True,
+)
 async def get_posts_for_last_week(
     page: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None),
+    fields: Optional[str] = Query(None),
     _: User = Depends(get_current_active_user),
-    session: AsyncSession = Depends(db.get_session),
+    session: AsyncSession = Depends(db.get_read_session),
 ) -> PostsPaginatedResponseModel:
+    next_cursor = None
     try:
-        if not page:
-            posts, total_pages = await get_all_posts_for_last_week(session), 1
-        else:
+        if cursor:
+            # One more post is read to know whether there is a next page
+            page_size = get_page_size()
+            posts = await get_posts_after_cursor(
+                session, decode_keyset_cursor(cursor), limit=page_size + 1
+            )
+            next_cursor = get_next_keyset_cursor(
+                posts[:page_size], has_more=len(posts) > page_size
+            )
+            posts, total_pages = posts[:page_size], None
+        elif page:
             posts, total_pages = await get_posts_by_page(session, page)
+            next_cursor = get_next_keyset_cursor(posts, has_more=page < total_pages)
+        else:
+            posts, total_pages = await get_all_posts_for_last_week(session), 1
     except InvalidPageNumException as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail='Page number is too big'
         ) from e
+    except InvalidCursorException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail='Cursor is invalid'
+        ) from e
 
     return PostsPaginatedResponseModel(
-        posts=[
-            PostHeavyResponseModel(
-                id=post.id,
-                header=post.header,
-                photo=base64_optional_encode(post.photo),
-                text=post.text,
-                posted_at=post.posted_at,
-                author=UserResponseModel(
-                    id=post.author.id,
-                    username=post.author.username,
-                    full_name=post.author.full_name,
-                ),
-            )
-            for post in posts
-        ],
-        page=page or 1,
+        posts=await get_posts_response(session, posts, parse_post_fields(fields)),
+        page=None if cursor else page or 1,
         total_pages=total_pages,
+        next_cursor=next_cursor,
     )
 
 
-@router.get('/posts/feed', response_model=PostsPaginatedResponseModel)
+@router.get(
+    '/posts/feed',
+    response_model=PostsPaginatedResponseModel,
+    response_model_exclude_unset=True,
+)
 async def get_feed(
     page: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None),
+    refresh: bool = Query(False),
+    fields: Optional[str] = Query(None),
     current_user: User = Depends(get_current_active_user),
-    session: AsyncSession = Depends(db.get_session),
+    session: AsyncSession = Depends(db.get_read_session),
 ) -> PostsPaginatedResponseModel:
-    recent_posts = await get_recently_viewed_posts_for_last_week(
-        session,
-        redis,
-        user_id=current_user.id,
-        current_timestamp=datetime.datetime.utcnow().timestamp(),
-    )
-
-    relevant_posts = set(
-        list(
-            itertools.chain(
-                *(
-                    await asyncio.gather(
-                        *[
-                            find_similar_recent_posts(session, post)
-                            for post in recent_posts
-                        ]
-                    )
-                )
-            )
-        )
-    )
-
-    posts_to_recommend = list(relevant_posts - set(recent_posts))
-
-    if page:
-        page_size = get_page_size()
-        start_post_idx = (page - 1) * page_size
-        total_pages = calculate_total_pages(
-            total_items=len(posts_to_recommend), page_size=page_size
+    # The feed is ranked once and stored, following pages are read from the snapshot
+    try:
+        feed_page = await get_feed_page(
+            session, current_user.id, page=page, cursor=cursor, refresh=refresh
         )
-        if page > total_pages:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST, detail='Page number is too big'
-            )
-        posts = posts_to_recommend[start_post_idx : start_post_idx + page_size]
-    else:
-        posts, total_pages = posts_to_recommend, 1
+    except InvalidPageNumException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail='Page number is too big'
+        ) from e
+    except InvalidCursorException as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail='Cursor is invalid or expired',
+        ) from e
 
     return PostsPaginatedResponseModel(
-        posts=[
-            PostHeavyResponseModel(
-                id=post.id,
-                header=post.header,
-                photo=base64_optional_encode(post.photo),
-                text=post.text,
-                posted_at=post.posted_at,
-                author=UserResponseModel(
-                    id=post.author.id,
-                    username=post.author.username,
-                    full_name=post.author.full_name,
-                ),
-            )
-            for post in posts
-        ],
-        page=page or 1,
-        total_pages=total_pages,
+        posts=await get_posts_response(
+            session, feed_page.posts, parse_post_fields(fields)
+        ),
+        page=feed_page.page,
+        total_pages=feed_page.total_pages,
+        next_cursor=feed_page.next_cursor,
     )
 
 
@@ -173,7 +243,9 @@ async def remove_existing_post(
             detail='Only admins can remove posts',
         )
     try:
-        await remove_post_by_id(session, post_id)
+        await remove_post_and_update_similar_posts(session, post_id)
+        await invalidate(post_response_cache, [post_id])
+        await invalidate(similar_posts_response_cache, [post_id])
     except PostNotFoundException as e:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -187,52 +259,41 @@ async def remove_existing_post(
 async def get_single_post(
     post_id: int,
     current_user: User = Depends(get_current_active_user),
-    session: AsyncSession = Depends(db.get_session),
+    session: AsyncSession = Depends(db.get_read_session),
 ) -> PostHeavyResponseModel:
-    post = await get_post_or_throw_not_found_exception(session, post_id)
+    response = post_response_cache.get(post_id)
+    if response is None:
+        post = await get_post_or_throw_not_found_exception(session, post_id)
+        (response,) = await get_posts_response(session, [post])
+        post_response_cache.set(post_id, response)
 
-    await update_browsing_history(
-        redis=redis,
+    # The view is written to the browsing history after the response
+    view_buffer.add(
         user_id=current_user.id,
-        current_timestamp=datetime.datetime.utcnow().timestamp(),
-        post_id=post.id,
-    )
-
-    return PostHeavyResponseModel(
-        id=post.id,
-        header=post.header,
-        photo=base64_optional_encode(post.photo),
-        text=post.text,
-        posted_at=post.posted_at,
-        author=UserResponseModel(
-            id=post.author.id,
-            username=post.author.username,
-            full_name=post.author.full_name,
-        ),
+        timestamp=datetime.datetime.utcnow().timestamp(),
+        post_id=post_id,
     )
+    return response
 
 
-@router.get('/posts/{post_id}/similar', response_model=List[PostHeavyResponseModel])
+@router.get(
+    '/posts/{post_id}/similar',
+    response_model=List[PostHeavyResponseModel],
+    response_model_exclude_unset=True,
+)
 async def get_similar_posts(
     post_id: int,
+    fields: Optional[str] = Query(None),
     _: User = Depends(get_current_active_user),
-    session: AsyncSession = Depends(db.get_session),
+    session: AsyncSession = Depends(db.get_read_session),
 ) -> List[PostHeavyResponseModel]:
-    post = await get_post_or_throw_not_found_exception(session, post_id)
-    similar_posts = await find_similar_recent_posts(session=session, original_post=post)
-
-    return [
-        PostHeavyResponseModel(
-            id=post.id,
-            header=post.header,
-            photo=base64_optional_encode(post.photo),
-            text=post.text,
-            posted_at=post.posted_at,
-            author=UserResponseModel(
-                id=post.author.id,
-                username=post.author.username,
-                full_name=post.author.full_name,
-            ),
-        )
-        for post in similar_posts
-    ]
+    fields_set = parse_post_fields(fields)
+    # Whole posts are cached, the requested fields are selected from them
+    responses = similar_posts_response_cache.get(post_id)
+    if responses is None:
+        post = await get_post_or_throw_not_found_exception(session, post_id)
+        similar_posts = await get_similar_recent_posts(session, post)
+        responses = await get_posts_response(session, similar_posts)
+        similar_posts_response_cache.set(post_id, responses)
+
+    return select_post_fields(responses, fields_set)
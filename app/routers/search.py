@@ -0,0 +1,40 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import SEARCH_RERANK_CANDIDATES, SEARCH_RESULTS_LIMIT
+from app.database.crud_search import search_posts
+from app.database.models import User
+from app.database.sqlite import db
+from app.schema import PostsSearchResponseModel
+from app.utils.auth import get_current_active_user
+from app.utils.common import get_posts_response, parse_post_fields
+from app.utils.ml import rerank_posts_by_meaning
+
+router = APIRouter()
+
+
+# Posts are found by their words, `semantic` reorders the best matches by meaning
+@router.get(
+    '/posts/search',
+    response_model=PostsSearchResponseModel,
+    response_model_exclude_unset=True,
+)
+async def search(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(SEARCH_RESULTS_LIMIT, ge=1, le=SEARCH_RERANK_CANDIDATES),
+    semantic: bool = Query(False),
+    fields: Optional[str] = Query(None),
+    _: User = Depends(get_current_active_user),
+    session: AsyncSession = Depends(db.get_read_session),
+) -> PostsSearchResponseModel:
+    if semantic:
+        candidates = await search_posts(session, q, limit=SEARCH_RERANK_CANDIDATES)
+        posts = (await rerank_posts_by_meaning(session, q, candidates))[:limit]
+    else:
+        posts = await search_posts(session, q, limit=limit)
+
+    return PostsSearchResponseModel(
+        posts=await get_posts_response(session, posts, parse_post_fields(fields))
+    )
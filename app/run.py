@@ -1,18 +1,78 @@
+import asyncio
+import logging
+from contextlib import suppress
+from datetime import datetime
+from typing import Awaitable, Callable
+
 import uvicorn
 
+from app.config import (
+    BROWSING_HISTORY_SWEEP_INTERVAL_SECONDS,
+    COUNTERS_RECONCILIATION_INTERVAL_SECONDS,
+    SIMILAR_POSTS_EXPIRY_INTERVAL_SECONDS,
+)
 from app.database.crud import create_admin, create_post, get_user_by_username
-from app.database.redis import redis
+from app.database.crud_counters import reconcile_counters
+from app.database.crud_history import (
+    move_legacy_browsing_history,
+    sweep_browsing_history,
+)
+from app.database.redis import RedisUnavailableError, redis
 from app.database.sqlite import db
 from app.factory import create_app
 from app.utils.auth import get_password_hash
+from app.utils.cache import listen_for_invalidations
+from app.utils.ml import backfill_post_embeddings, inference_executor, model
+from app.utils.photos import move_legacy_photos
+from app.utils.similar_posts import calculate_all_similar_posts, expire_similar_posts
+from app.utils.views import view_buffer
+
+logger = logging.getLogger(__name__)
 
 main_app = create_app()
 
 
+async def run_periodically(
+    name: str, interval: float, job: Callable[[], Awaitable[None]]
+) -> None:
+    # A failed run is logged, the job is run again after the interval anyway
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Periodic job %s failed', name)
+
+
+async def warmup() -> None:
+    try:
+        await model.warmup()
+        # Persist embeddings of the posts that were added before they were stored
+        await backfill_post_embeddings()
+        await calculate_all_similar_posts()
+    except Exception:  # pylint: disable=broad-except
+        logger.exception('Warmup failed')
+
+
+async def reconcile_all_counters() -> None:
+    async with db.create_session() as session:
+        await reconcile_counters(session)
+
+
+async def sweep_all_browsing_histories() -> None:
+    # Skipped while Redis is down, reads ignore older views anyway
+    with suppress(RedisUnavailableError):
+        await sweep_browsing_history(redis, datetime.utcnow().timestamp())
+
+
 @main_app.on_event('startup')
 async def startup_event() -> None:
     # Initialize SQLite asynchronously
     await db.init()
+    async with db.create_session() as session:
+        await move_legacy_photos(session)
+    # Counters of a database created before they were maintained are filled in here
+    await reconcile_all_counters()
 
     # Add Admin if it doesn't already exist
     async with db.create_session() as session:
@@ -26,45 +86,83 @@ async def startup_event() -> None:
             await create_post(
                 session=session,
                 header='USA starts withdrawal of troops from Afghanistan',
-                photo=b'',
+                photo_hash=None,
                 text='',
                 author=user,
             )
             await create_post(
                 session=session,
                 header='Trump is the first American President being impeached twice',
-                photo=b'',
+                photo_hash=None,
                 text='',
                 author=user,
             )
             await create_post(
                 session=session,
                 header='Havertz double leaves Fulham in trouble',
-                photo=b'',
+                photo_hash=None,
                 text='',
                 author=user,
             )
             await create_post(
                 session=session,
                 header='Manchester City could clinch the Football Premier League',
-                photo=b'',
+                photo_hash=None,
                 text='',
                 author=user,
             )
             await create_post(
                 session=session,
                 header='La Liga: Real Madrid vs Osasuna - who will win the first prize?',
-                photo=b'',
+                photo_hash=None,
                 text='',
                 author=user,
             )
 
     # Initialize Redis asynchronously
     await redis.init()
+    with suppress(RedisUnavailableError):
+        await move_legacy_browsing_history(redis)
+
+    # Warm up the model in the background, routes that don't need it are served meanwhile
+    main_app.state.warmup_task = asyncio.create_task(warmup())
+    # Posts leave the last week over time, their neighbours are replaced periodically
+    main_app.state.similar_posts_expiry_task = asyncio.create_task(
+        run_periodically(
+            'similar posts expiry',
+            SIMILAR_POSTS_EXPIRY_INTERVAL_SECONDS,
+            expire_similar_posts,
+        )
+    )
+    main_app.state.reconciliation_task = asyncio.create_task(
+        run_periodically(
+            'counters reconciliation',
+            COUNTERS_RECONCILIATION_INTERVAL_SECONDS,
+            reconcile_all_counters,
+        )
+    )
+    # Histories are trimmed here, off the path of the requests
+    main_app.state.sweeper_task = asyncio.create_task(
+        run_periodically(
+            'browsing history sweep',
+            BROWSING_HISTORY_SWEEP_INTERVAL_SECONDS,
+            sweep_all_browsing_histories,
+        )
+    )
+    view_buffer.start()
+    # Caches of this worker are evicted on changes made by any of the workers
+    main_app.state.invalidation_task = asyncio.create_task(listen_for_invalidations())
 
 
 @main_app.on_event('shutdown')
 async def shutdown_event() -> None:
+    main_app.state.warmup_task.cancel()
+    main_app.state.similar_posts_expiry_task.cancel()
+    main_app.state.reconciliation_task.cancel()
+    main_app.state.sweeper_task.cancel()
+    await view_buffer.stop()
+    main_app.state.invalidation_task.cancel()
+    inference_executor.shutdown()
     await redis.close()
 
 
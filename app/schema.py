@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 from pydantic import BaseModel
 from pydantic.types import SecretStr
@@ -28,19 +28,46 @@ class PostLightResponseModel(BaseModel):
     id: int
 
 
+# Listings return only the requested fields besides the id, see `fields`
 class PostHeavyResponseModel(BaseModel):
     id: int
-    header: str
-    photo: Optional[bytes]
-    text: str
-    author: UserResponseModel
-    posted_at: datetime
+    header: Optional[str]
+    photo_url: Optional[str]
+    text: Optional[str]
+    author: Optional[UserResponseModel]
+    posted_at: Optional[datetime]
+    comment_count: Optional[int]
 
 
 class PostsPaginatedResponseModel(BaseModel):
     posts: List[PostHeavyResponseModel]
-    page: int
-    total_pages: int
+    # Pages aren't counted when the listing is read by cursor
+    page: Optional[int]
+    total_pages: Optional[int]
+    # Opaque position of the next page, missing on the last one
+    next_cursor: Optional[str]
+
+
+class PostsSearchResponseModel(BaseModel):
+    # The best matches first
+    posts: List[PostHeavyResponseModel]
+
+
+class PostBulkItemModel(BaseModel):
+    header: str
+    text: str
+    # Base64 of the photo in JSON batches, the name of its file part in multipart ones
+    photo: Optional[str]
+
+
+class PostBulkResultModel(BaseModel):
+    # Either the id of the created post or the reason why it wasn't created
+    id: Optional[int]
+    error: Optional[str]
+
+
+class PostsBulkResponseModel(BaseModel):
+    posts: List[PostBulkResultModel]
 
 
 class UserRegisterRequestBodyModel(BaseModel):
@@ -65,5 +92,45 @@ class CommentHeavyResponseModel(BaseModel):
 
 class CommentsPaginatedResponseModel(BaseModel):
     comments: List[CommentHeavyResponseModel]
-    page: int
-    total_pages: int
+    page: Optional[int]
+    total_pages: Optional[int]
+    next_cursor: Optional[str]
+
+
+class PostExportModel(BaseModel):
+    id: int
+    author_id: int
+    header: str
+    text: Optional[str]
+    photo_url: Optional[str]
+    posted_at: datetime
+
+
+class CommentExportModel(BaseModel):
+    id: int
+    author_id: int
+    post_id: int
+    text: Optional[str]
+    posted_at: datetime
+
+
+class ViewBufferStatsModel(BaseModel):
+    buffered: int
+    flushed: int
+    overflowed: int
+    dropped: int
+
+
+class CacheStatsModel(BaseModel):
+    size: int
+    hits: int
+    misses: int
+    hit_rate: Optional[float]
+
+
+class HealthResponseModel(BaseModel):
+    status: str
+    model_ready: bool
+    redis_available: bool
+    view_buffer: ViewBufferStatsModel
+    caches: Dict[str, CacheStatsModel]
@@ -52,7 +52,8 @@ def create_access_token(
 
 
 async def get_current_active_user(
-    session: AsyncSession = Depends(db.get_session), token: str = Depends(oauth2_scheme)
+    session: AsyncSession = Depends(db.get_read_session),
+    token: str = Depends(oauth2_scheme),
 ) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -0,0 +1,92 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Union, cast
+
+from fastapi import Request
+from pydantic import ValidationError
+from starlette.datastructures import UploadFile
+
+from app.config import BULK_POSTS_MAX_SIZE
+from app.schema import PostBulkItemModel
+
+
+class NewPost(NamedTuple):
+    header: str
+    text: str
+    photo: Optional[bytes]
+
+
+def get_error_message(e: ValidationError) -> str:
+    return '; '.join(
+        f'{".".join(map(str, error["loc"]))}: {error["msg"]}' for error in e.errors()
+    )
+
+
+def decode_base64_photo(photo: str) -> bytes:
+    try:
+        return base64.b64decode(photo, validate=True)
+    except binascii.Error as e:
+        raise ValueError('photo: invalid base64') from e
+
+
+def parse_bulk_post(
+    item: Any, get_photo: Callable[[str], bytes]
+) -> Union[NewPost, str]:
+    # Invalid posts are reported by their position, the rest of the batch is created
+    try:
+        post = PostBulkItemModel.parse_obj(item)
+        photo = get_photo(post.photo) if post.photo else None
+    except ValidationError as e:
+        return get_error_message(e)
+    except ValueError as e:
+        return str(e)
+    return NewPost(header=post.header, text=post.text, photo=photo)
+
+
+async def read_multipart_batch(request: Request) -> Tuple[Any, Dict[str, bytes]]:
+    # Photos are sent as file parts, which are referenced by name from the posts
+    form = await request.form()
+    photos = {
+        name: cast(bytes, await value.read())
+        for name, value in form.multi_items()
+        if isinstance(value, UploadFile)
+    }
+    posts = form.get('posts')
+    if not isinstance(posts, str):
+        raise InvalidBulkPostsException('Posts must be sent as a form field')
+    return json.loads(posts), photos
+
+
+async def parse_bulk_posts(request: Request) -> List[Union[NewPost, str]]:
+    is_multipart = request.headers.get('content-type', '').startswith(
+        'multipart/form-data'
+    )
+    photos: Dict[str, bytes] = {}
+    try:
+        if is_multipart:
+            items, photos = await read_multipart_batch(request)
+        else:
+            items = (await request.json()).get('posts')
+    except (ValueError, AttributeError) as e:
+        raise InvalidBulkPostsException('Batch must be a list of posts') from e
+
+    if not isinstance(items, list):
+        raise InvalidBulkPostsException('Batch must be a list of posts')
+    if len(items) > BULK_POSTS_MAX_SIZE:
+        raise InvalidBulkPostsException(
+            f'Batch can contain at most {BULK_POSTS_MAX_SIZE} posts'
+        )
+
+    def get_photo(photo: str) -> bytes:
+        if not is_multipart:
+            return decode_base64_photo(photo)
+        if photo not in photos:
+            raise ValueError(f'photo: file {photo} is missing')
+        return photos[photo]
+
+    return [parse_bulk_post(item, get_photo) for item in items]
+
+
+class InvalidBulkPostsException(Exception):
+    pass
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from contextlib import suppress
+from typing import Any, Dict, Hashable, Optional, Sequence, Tuple
+
+from app.config import (
+    EMBEDDING_LOCAL_CACHE_SIZE,
+    EMBEDDING_LOCAL_CACHE_TTL_SECONDS,
+    INVALIDATION_RESUBSCRIBE_INTERVAL_SECONDS,
+    RESPONSE_LOCAL_CACHE_SIZE,
+    RESPONSE_LOCAL_CACHE_TTL_SECONDS,
+)
+from app.database.redis import RedisUnavailableError, redis
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+
+# Size-bounded LRU cache in the memory of a worker, in front of Redis and SQLite.
+# Entries also expire after the TTL, which bounds how stale they can get when an
+# invalidation is missed. `None` can't be cached, it means a miss.
+class LocalCache:
+    def __init__(self, name: str, max_size: int, ttl: float) -> None:
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._items: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        caches[name] = self
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> Any:
+        item = self._items.get(key)
+        if item is None or item[0] < time.monotonic():
+            self._items.pop(key, None)
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._items[key] = (time.monotonic() + self.ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+    def evict(self, keys: Optional[Sequence[Hashable]] = None) -> None:
+        if keys is None:
+            self._items.clear()
+        for key in keys or []:
+            self._items.pop(key, None)
+
+    def clear(self) -> None:
+        self._items.clear()
+        self.hits = self.misses = 0
+
+
+caches: Dict[str, LocalCache] = {}
+embedding_cache = LocalCache(
+    'embeddings',
+    max_size=EMBEDDING_LOCAL_CACHE_SIZE,
+    ttl=EMBEDDING_LOCAL_CACHE_TTL_SECONDS,
+)
+post_response_cache = LocalCache(
+    'post_responses',
+    max_size=RESPONSE_LOCAL_CACHE_SIZE,
+    ttl=RESPONSE_LOCAL_CACHE_TTL_SECONDS,
+)
+similar_posts_response_cache = LocalCache(
+    'similar_posts_responses',
+    max_size=RESPONSE_LOCAL_CACHE_SIZE,
+    ttl=RESPONSE_LOCAL_CACHE_TTL_SECONDS,
+)
+
+
+async def invalidate(
+    cache: LocalCache, keys: Optional[Sequence[Hashable]] = None
+) -> None:
+    # Evicted here right away and by all workers when they get the message.
+    # Without keys the whole cache is evicted. While Redis is down other workers
+    # miss the message, their caches are cleared once they resubscribe.
+    cache.evict(keys)
+    with suppress(RedisUnavailableError):
+        await redis.publish(
+            INVALIDATION_CHANNEL, json.dumps({'cache': cache.name, 'keys': keys})
+        )
+
+
+def handle_invalidation(message: bytes) -> None:
+    # Malformed messages are skipped, they would stop the listener of this worker
+    try:
+        invalidation = json.loads(message)
+        cache = caches.get(invalidation['cache'])
+        if cache:
+            cache.evict(invalidation['keys'])
+    except (ValueError, KeyError, TypeError):
+        logger.warning('Malformed invalidation: %r', message)
+
+
+async def listen_for_invalidations() -> None:
+    while True:
+        try:
+            channel = await redis.subscribe(INVALIDATION_CHANNEL)
+        except RedisUnavailableError:
+            await asyncio.sleep(INVALIDATION_RESUBSCRIBE_INTERVAL_SECONDS)
+            continue
+        # Invalidations may have been missed while this worker wasn't subscribed
+        for cache in caches.values():
+            cache.evict()
+        async for message in channel.iter():
+            handle_invalidation(message)
+        # The channel is closed when the connection to Redis is lost
+        await asyncio.sleep(INVALIDATION_RESUBSCRIBE_INTERVAL_SECONDS)
@@ -1,5 +1,7 @@
 import base64
-from typing import Optional
+import binascii
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
 
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -8,6 +10,22 @@ from starlette import status
 import app.database.crud as crud
 from app.config import PAGE_SIZE
 from app.database.models import Post
+from app.schema import PostHeavyResponseModel, UserResponseModel
+from app.utils.photos import get_photo_url
+
+POST_FIELD_GETTERS: Dict[str, Callable[[Post], Any]] = {
+    'header': lambda post: post.header,
+    'photo_url': lambda post: get_photo_url(post.photo_hash),
+    'text': lambda post: post.text,
+    'author': lambda post: UserResponseModel(
+        id=post.author.id,
+        username=post.author.username,
+        full_name=post.author.full_name,
+    ),
+    'posted_at': lambda post: post.posted_at,
+    'comment_count': lambda post: post.comment_count,
+}
+POST_CONTENT_FIELDS = {'photo_url', 'text'}
 
 
 def calculate_total_pages(total_items: int, page_size: int) -> int:
@@ -18,10 +36,22 @@ def get_page_size() -> int:
     return PAGE_SIZE
 
 
-def base64_optional_encode(value: Optional[bytes]) -> Optional[bytes]:
-    if value is not None:
-        return base64.b64encode(value)
-    return None
+def encode_keyset_cursor(item: Any) -> str:
+    # Position after an item in the listings ordered by (`posted_at`, `id`)
+    position = f'{item.posted_at.isoformat()}|{item.id}'
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_keyset_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        posted_at, item_id = base64.urlsafe_b64decode(cursor).decode().split('|')
+        return datetime.fromisoformat(posted_at), int(item_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise crud.InvalidCursorException() from e
+
+
+def get_next_keyset_cursor(items: Sequence[Any], has_more: bool) -> Optional[str]:
+    return encode_keyset_cursor(items[-1]) if items and has_more else None
 
 
 async def get_post_or_throw_not_found_exception(
@@ -34,3 +64,46 @@ async def get_post_or_throw_not_found_exception(
             detail=f'Post with id = {post_id} was not found',
         )
     return post
+
+
+def parse_post_fields(fields: Optional[str]) -> Optional[Set[str]]:
+    # Sparse fieldsets, e.g. `fields=header,posted_at`, the id is always returned
+    if fields is None:
+        return None
+    requested_fields = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown_fields = requested_fields - POST_FIELD_GETTERS.keys()
+    if unknown_fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Unknown fields: {", ".join(sorted(unknown_fields))}',
+        )
+    return requested_fields
+
+
+def select_post_fields(
+    posts: List[PostHeavyResponseModel], fields: Optional[Set[str]]
+) -> List[PostHeavyResponseModel]:
+    if fields is None:
+        return posts
+    return [
+        PostHeavyResponseModel(
+            id=post.id, **{field: getattr(post, field) for field in fields}
+        )
+        for post in posts
+    ]
+
+
+async def get_posts_response(
+    session: AsyncSession, posts: List[Post], fields: Optional[Set[str]] = None
+) -> List[PostHeavyResponseModel]:
+    fields = set(POST_FIELD_GETTERS) if fields is None else fields
+    if fields & POST_CONTENT_FIELDS:
+        await crud.load_posts_content(session, posts)
+
+    return [
+        PostHeavyResponseModel(
+            id=post.id,
+            **{field: POST_FIELD_GETTERS[field](post) for field in fields},
+        )
+        for post in posts
+    ]
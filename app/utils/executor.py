@@ -0,0 +1,40 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar('T')
+
+
+# Thread pool for CPU-bound model calls, so they don't block the event loop.
+# NumPy and torch release the GIL while computing, and the number of jobs that are
+# running or waiting is capped, so an overloaded worker rejects new ones right away.
+class InferenceExecutor:
+    def __init__(self, max_workers: int, max_queue_size: int) -> None:
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='inference'
+        )
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_size)
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        # pylint: disable=consider-using-with
+        if not self._slots.acquire(blocking=False):
+            raise InferenceQueueFullError()
+
+        try:
+            future: 'Future[T]' = self._executor.submit(func, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Jobs cancelled before they start are released here as well
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+class InferenceQueueFullError(Exception):
+    pass
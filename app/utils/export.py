@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+from app.database.crud_export import stream_comments_since, stream_posts_since
+from app.database.sqlite import db
+from app.schema import CommentExportModel, PostExportModel
+from app.utils.photos import get_photo_url
+
+# Rows are exported as newline-delimited JSON, one batch of the cursor per chunk, so
+# the memory doesn't depend on the size of the tables. The session is opened by the
+# generator itself, as the body is sent after the endpoint has returned.
+
+
+async def export_posts(since: Optional[datetime]) -> AsyncIterator[bytes]:
+    async with db.create_session(read_only=True) as session:
+        result = await stream_posts_since(session, since)
+        async for rows in result.partitions():
+            yield ''.join(
+                PostExportModel(
+                    id=row.id,
+                    author_id=row.author_id,
+                    header=row.header,
+                    text=row.text,
+                    photo_url=get_photo_url(row.photo_hash),
+                    posted_at=row.posted_at,
+                ).json()
+                + '\n'
+                for row in rows
+            ).encode()
+
+
+async def export_comments(since: Optional[datetime]) -> AsyncIterator[bytes]:
+    async with db.create_session(read_only=True) as session:
+        result = await stream_comments_since(session, since)
+        async for rows in result.partitions():
+            yield ''.join(
+                CommentExportModel(
+                    id=row.id,
+                    author_id=row.author_id,
+                    post_id=row.post_id,
+                    text=row.text,
+                    posted_at=row.posted_at,
+                ).json()
+                + '\n'
+                for row in rows
+            ).encode()
@@ -0,0 +1,194 @@
+import base64
+import binascii
+import uuid
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Tuple, cast
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import K_NEAREST_NEIGHBOURS, POSTS_SIMILARITY_THRESHOLD, settings
+from app.database.crud import (
+    InvalidCursorException,
+    InvalidPageNumException,
+    get_all_posts_for_last_week,
+    get_posts_by_ids,
+)
+from app.database.crud_history import get_recently_viewed_posts_for_last_week
+from app.database.models import Post
+from app.database.redis import RedisUnavailableError, redis
+from app.utils.common import calculate_total_pages, get_page_size
+from app.utils.index import normalize
+from app.utils.ml import get_embeddings_of_indexed_posts, get_recent_posts_index
+
+
+class FeedPage(NamedTuple):
+    posts: List[Post]
+    page: int
+    total_pages: int
+    next_cursor: Optional[str]
+
+
+async def rank_feed(session: AsyncSession, viewed_posts: List[Post]) -> List[int]:
+    if not viewed_posts:
+        return []
+
+    index = await get_recent_posts_index(session)
+    embeddings = normalize(
+        np.stack(await get_embeddings_of_indexed_posts(session, index, viewed_posts))
+    )
+    viewed_posts_ids = [post.id for post in viewed_posts]
+    similar_posts_ids = index.query(
+        embeddings,
+        k=K_NEAREST_NEIGHBOURS,
+        threshold=POSTS_SIMILARITY_THRESHOLD,
+        exclude_ids=viewed_posts_ids,
+    )
+
+    # Every recommended post is ranked by its best similarity to any viewed post
+    scores: Dict[int, float] = {}
+    for embedding, ids in zip(embeddings, similar_posts_ids):
+        for post_id in ids:
+            if post_id not in viewed_posts_ids:
+                score = float(cast(np.ndarray, index.get(post_id)) @ embedding)
+                scores[post_id] = max(score, scores.get(post_id, score))
+    return sorted(scores, key=lambda post_id: (-scores[post_id], post_id))
+
+
+def get_current_feed_key(user_id: int) -> str:
+    return f'feed:{user_id}'
+
+
+def get_feed_snapshot_key(user_id: int, snapshot_id: str) -> str:
+    return f'feed:{user_id}:{snapshot_id}'
+
+
+def encode_cursor(snapshot_id: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f'{snapshot_id}:{offset}'.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        snapshot_id, offset = base64.urlsafe_b64decode(cursor).decode().split(':')
+        if int(offset) < 0:
+            raise ValueError(offset)
+        return snapshot_id, int(offset)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursorException() from e
+
+
+async def create_feed_snapshot(session: AsyncSession, user_id: int) -> str:
+    viewed_posts = await get_recently_viewed_posts_for_last_week(
+        session,
+        redis,
+        user_id=user_id,
+        current_timestamp=datetime.utcnow().timestamp(),
+    )
+    ranked_posts_ids = await rank_feed(session, viewed_posts)
+
+    # The current snapshot of the user is pointed to, so that its pages are reused
+    snapshot_id = uuid.uuid4().hex
+    ttl = settings.feed_snapshot_ttl_seconds
+    snapshot_key = get_feed_snapshot_key(user_id, snapshot_id)
+    async with redis.pipeline(transaction=True) as transaction:
+        if ranked_posts_ids:
+            transaction.rpush(snapshot_key, *ranked_posts_ids)
+        transaction.expire(snapshot_key, ttl)
+        transaction.set(get_current_feed_key(user_id), snapshot_id, expire=ttl)
+    return snapshot_id
+
+
+async def get_snapshot_feed_page(
+    session: AsyncSession,
+    user_id: int,
+    page: Optional[int],
+    cursor: Optional[str],
+    refresh: bool,
+) -> FeedPage:
+    page_size = get_page_size()
+    if cursor is not None:
+        snapshot_id, offset = decode_cursor(cursor)
+        # Snapshots of other users and expired ones are missing as well
+        if not await redis.exists(get_feed_snapshot_key(user_id, snapshot_id)):
+            raise InvalidCursorException()
+    else:
+        current_snapshot_id = (
+            None if refresh else await redis.get(get_current_feed_key(user_id))
+        )
+        snapshot_id = (
+            current_snapshot_id.decode()
+            if current_snapshot_id
+            else await create_feed_snapshot(session, user_id)
+        )
+        offset = (page - 1) * page_size if page else 0
+
+    snapshot_key = get_feed_snapshot_key(user_id, snapshot_id)
+    if page is None and cursor is None:
+        # Without a page or a cursor, the whole feed is returned at once
+        posts_ids = await redis.lrange(snapshot_key, 0, -1)
+        posts = await get_posts_by_ids(session, [int(post_id) for post_id in posts_ids])
+        return FeedPage(posts=posts, page=1, total_pages=1, next_cursor=None)
+
+    # Only the ids of one page are read from the snapshot, together with its length
+    async with redis.pipeline() as pipe:
+        total_posts_future = pipe.llen(snapshot_key)
+        posts_ids_future = pipe.lrange(snapshot_key, offset, offset + page_size - 1)
+    total_posts = await total_posts_future
+    total_pages = calculate_total_pages(total_posts, page_size)
+    if offset // page_size + 1 > total_pages:
+        raise InvalidPageNumException()
+
+    posts_ids = await posts_ids_future
+    posts = await get_posts_by_ids(session, [int(post_id) for post_id in posts_ids])
+    next_offset = offset + page_size
+
+    return FeedPage(
+        posts=posts,
+        page=offset // page_size + 1,
+        total_pages=total_pages,
+        next_cursor=(
+            encode_cursor(snapshot_id, next_offset)
+            if next_offset < total_posts
+            else None
+        ),
+    )
+
+
+async def get_fallback_feed_page(
+    session: AsyncSession, page: Optional[int]
+) -> FeedPage:
+    # Served while Redis is down, the posts of the last week with the newest first
+    posts = sorted(
+        await get_all_posts_for_last_week(session),
+        key=lambda post: (post.posted_at, post.id),
+        reverse=True,
+    )
+    if page is None:
+        return FeedPage(posts=posts, page=1, total_pages=1, next_cursor=None)
+
+    page_size = get_page_size()
+    total_pages = calculate_total_pages(len(posts), page_size)
+    if page > total_pages:
+        raise InvalidPageNumException()
+    return FeedPage(
+        posts=posts[(page - 1) * page_size : page * page_size],
+        page=page,
+        total_pages=total_pages,
+        next_cursor=None,
+    )
+
+
+async def get_feed_page(
+    session: AsyncSession,
+    user_id: int,
+    page: Optional[int] = None,
+    cursor: Optional[str] = None,
+    refresh: bool = False,
+) -> FeedPage:
+    try:
+        return await get_snapshot_feed_page(session, user_id, page, cursor, refresh)
+    except RedisUnavailableError as e:
+        # Cursors point into snapshots, which can't be read without Redis
+        if cursor is not None:
+            raise InvalidCursorException() from e
+        return await get_fallback_feed_page(session, page)
@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import string
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+
+EMBEDDINGS_FILE_NAME = 'embeddings.npy'
+TOKENIZER_FILE_NAME = 'tokenizer.json'
+
+
+# Word-vector lookup and mean pooling of `average_word_embeddings_*` models in NumPy.
+# The vocabulary matrix is memory-mapped, so all workers share one page-cached copy.
+class GloveEmbeddingEngine:
+    def __init__(
+        self,
+        embeddings: np.ndarray,
+        vocab: Iterable[str],
+        stop_words: Iterable[str],
+        do_lower_case: bool,
+    ) -> None:
+        self.embeddings = embeddings
+        self.word2idx: Dict[str, int] = {word: idx for idx, word in enumerate(vocab)}
+        self.stop_words = set(stop_words)
+        self.do_lower_case = do_lower_case
+
+    @classmethod
+    def load(cls, directory: Path) -> 'GloveEmbeddingEngine':
+        config = json.loads((directory / TOKENIZER_FILE_NAME).read_text())
+        return cls(
+            embeddings=np.load(directory / EMBEDDINGS_FILE_NAME, mmap_mode='r'),
+            vocab=config['vocab'],
+            stop_words=config['stop_words'],
+            do_lower_case=config['do_lower_case'],
+        )
+
+    def tokenize(self, text: str) -> List[int]:
+        # Same rules as `WhitespaceTokenizer` of sentence-transformers
+        if self.do_lower_case:
+            text = text.lower()
+
+        tokens = []
+        for token in text.split():
+            stripped_token = token.strip(string.punctuation)
+            for candidate in (token, stripped_token, stripped_token.lower()):
+                if candidate in self.stop_words:
+                    break
+                if candidate in self.word2idx:
+                    tokens.append(self.word2idx[candidate])
+                    break
+        return tokens
+
+    def encode(self, sentences: Any, **_: Any) -> np.ndarray:
+        if isinstance(sentences, str):
+            return self.encode([sentences])[0]
+
+        tokenized = [self.tokenize(sentence) for sentence in sentences]
+        lengths = np.array([len(tokens) for tokens in tokenized], dtype=np.int64)
+        token_ids = np.fromiter(chain.from_iterable(tokenized), dtype=np.int64)
+
+        # Gather every token of the batch at once and sum them per sentence
+        result = np.zeros((len(tokenized), self.embeddings.shape[1]), dtype=np.float32)
+        non_empty = lengths > 0
+        if token_ids.size:
+            offsets = (np.cumsum(lengths) - lengths)[non_empty]
+            sums = np.add.reduceat(self.embeddings[token_ids], offsets, axis=0)
+            result[non_empty] = sums / lengths[non_empty, None]
+        return result
+
+
+def export_word_embeddings(model: Any, directory: Path) -> bool:
+    # Converts a loaded SentenceTransformer once, only plain word-embedding models fit
+    word_embeddings = model[0]
+    tokenizer: Any = getattr(word_embeddings, 'tokenizer', None)
+    if not hasattr(word_embeddings, 'emb_layer') or not hasattr(tokenizer, 'word2idx'):
+        return False
+
+    # Write into a temporary directory first, other workers may be converting as well
+    temporary_directory = directory.with_name(f'{directory.name}.{os.getpid()}.tmp')
+    temporary_directory.mkdir(parents=True, exist_ok=True)
+    weights = word_embeddings.emb_layer.weight.detach().cpu().numpy()
+    np.save(temporary_directory / EMBEDDINGS_FILE_NAME, weights.astype(np.float32))
+    (temporary_directory / TOKENIZER_FILE_NAME).write_text(
+        json.dumps(
+            {
+                'vocab': list(tokenizer.word2idx),
+                'stop_words': sorted(tokenizer.stop_words),
+                'do_lower_case': tokenizer.do_lower_case,
+            }
+        )
+    )
+
+    try:
+        temporary_directory.rename(directory)
+    except OSError:  # pragma: no cover
+        shutil.rmtree(temporary_directory)
+    return True
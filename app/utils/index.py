@@ -0,0 +1,150 @@
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+INITIAL_CAPACITY = 64
+EPSILON = 1e-12
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, EPSILON)
+
+
+# Contiguous matrix of L2-normalized embeddings stored next to the ids of their posts.
+# Rows live in preallocated arrays that double in size when full, so adding a post
+# is amortized O(1), and removing one moves the last row into the freed slot.
+class EmbeddingIndex:
+
+    def __init__(self, ttl: Optional[float] = None) -> None:
+        self.ttl = ttl
+        self.loaded_at: Optional[float] = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._timestamps = np.empty(0, dtype=np.float64)
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._positions: Dict[int, int] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._ids[: self._size].tolist())
+
+    def __contains__(self, post_id: int) -> bool:
+        return post_id in self._positions
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    @property
+    def is_expired(self) -> bool:
+        if self.loaded_at is None:
+            return True
+        return self.ttl is not None and time.monotonic() - self.loaded_at > self.ttl
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._matrix[: self._size]
+
+    def clear(self) -> None:
+        self.loaded_at = None
+        self._positions = {}
+        self._size = 0
+
+    def load(
+        self,
+        ids: Iterable[int],
+        embeddings: Iterable[np.ndarray],
+        timestamps: Iterable[float],
+    ) -> None:
+        self.clear()
+        for post_id, embedding, timestamp in zip(ids, embeddings, timestamps):
+            self.add(post_id, embedding, timestamp)
+        self.loaded_at = time.monotonic()
+
+    def add(self, post_id: int, embedding: np.ndarray, timestamp: float) -> None:
+        vector = normalize(embedding).ravel()
+        if post_id in self._positions:
+            position = self._positions[post_id]
+        else:
+            self._reserve(self._size + 1, dimension=vector.shape[0])
+            position = self._size
+            self._positions[post_id] = position
+            self._size += 1
+
+        self._ids[position] = post_id
+        self._timestamps[position] = timestamp
+        self._matrix[position] = vector
+
+    def remove(self, post_id: int) -> None:
+        position = self._positions.pop(post_id, None)
+        if position is None:
+            return
+
+        last = self._size - 1
+        if position != last:
+            self._ids[position] = self._ids[last]
+            self._timestamps[position] = self._timestamps[last]
+            self._matrix[position] = self._matrix[last]
+            self._positions[int(self._ids[position])] = position
+        self._size = last
+
+    def remove_older_than(self, min_timestamp: float) -> None:
+        size = self._size
+        expired_ids = self._ids[:size][self._timestamps[:size] < min_timestamp]
+        for post_id in expired_ids.tolist():
+            self.remove(post_id)
+
+    def get(self, post_id: int) -> Optional[np.ndarray]:
+        position = self._positions.get(post_id)
+        return None if position is None else self._matrix[position]
+
+    def query(
+        self,
+        embeddings: np.ndarray,
+        k: int,
+        threshold: float,
+        exclude_ids: Optional[Sequence[Optional[int]]] = None,
+    ) -> List[List[int]]:
+        # One row of ids per query embedding, best first, all rows scored at once
+        queries = normalize(np.atleast_2d(embeddings))
+        if not self._size or k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        scores = queries @ self.matrix.T
+        for row, exclude_id in enumerate(exclude_ids or []):
+            if exclude_id is not None and exclude_id in self._positions:
+                scores[row, self._positions[exclude_id]] = -np.inf
+
+        # Partial selection of the best `k` rows, only those are sorted afterwards
+        k = min(k, self._size)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        is_similar = np.take_along_axis(top_scores, order, axis=1) > threshold
+
+        return [
+            self._ids[positions[mask]].tolist()
+            for positions, mask in zip(top, is_similar)
+        ]
+
+    def _reserve(self, size: int, dimension: int) -> None:
+        capacity = self._ids.shape[0]
+        if size <= capacity:
+            return
+
+        new_capacity = max(INITIAL_CAPACITY, 2 * capacity)
+        ids = np.empty(new_capacity, dtype=np.int64)
+        timestamps = np.empty(new_capacity, dtype=np.float64)
+        matrix = np.empty((new_capacity, dimension), dtype=np.float32)
+        if self._size:
+            ids[: self._size] = self._ids[: self._size]
+            timestamps[: self._size] = self._timestamps[: self._size]
+            matrix[: self._size] = self.matrix
+
+        self._ids, self._timestamps, self._matrix = ids, timestamps, matrix
@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from functools import partial
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+from app.config import settings
+from app.utils.executor import InferenceExecutor
+from app.utils.glove import GloveEmbeddingEngine, export_word_embeddings
+
+if TYPE_CHECKING:  # pragma: no cover
+    from sentence_transformers import SentenceTransformer
+
+
+class LazyModel:
+    # Importing torch and loading the weights takes seconds and hundreds of MB,
+    # so it's postponed until the model is warmed up or used for the first time
+    def __init__(
+        self,
+        path: Path,
+        name: str,
+        numpy_path: Optional[Path] = None,
+        executor: Optional[InferenceExecutor] = None,
+    ) -> None:
+        self.path = path
+        self.name = name
+        # The NumPy engine is used instead of torch when its directory is given
+        self.numpy_path = numpy_path
+        self.executor = executor
+        self._model: Optional[Union['SentenceTransformer', GloveEmbeddingEngine]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._model is not None
+
+    def get(self) -> Union['SentenceTransformer', GloveEmbeddingEngine]:
+        if self._model is None:
+            # Requests may need the model while it's still being loaded by the warmup
+            with self._lock:
+                if self._model is None:
+                    self._model = self._load()
+        return self._model
+
+    def encode(self, sentences: Any, **kwargs: Any) -> Any:
+        return self.get().encode(sentences, **kwargs)
+
+    async def encode_async(self, sentences: Any, **kwargs: Any) -> Any:
+        if self.executor is None:
+            loop = asyncio.get_event_loop()
+            return await loop.run_in_executor(
+                None, partial(self.encode, sentences, **kwargs)
+            )
+        return await self.executor.run(self.encode, sentences, **kwargs)
+
+    async def warmup(self) -> None:
+        await self.encode_async(['warmup'])
+
+    def _load(self) -> Union['SentenceTransformer', GloveEmbeddingEngine]:
+        if self.numpy_path is None:
+            return self._load_sentence_transformer()
+
+        # Torch is only needed once to convert the weights, later starts just map them
+        if not self.numpy_path.exists():
+            sentence_transformer = self._load_sentence_transformer()
+            if not export_word_embeddings(sentence_transformer, self.numpy_path):
+                return sentence_transformer
+        return GloveEmbeddingEngine.load(self.numpy_path)
+
+    def _load_sentence_transformer(self) -> 'SentenceTransformer':
+        # pylint: disable=import-outside-toplevel
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        # Several uvicorn workers on one host shouldn't oversubscribe the cores
+        if settings.torch_threads is not None:  # pragma: no cover
+            torch.set_num_threads(settings.torch_threads)
+
+        if self.path.exists():  # pragma: no cover
+            return SentenceTransformer(model_name_or_path=str(self.path.absolute()))
+        return SentenceTransformer(model_name_or_path=self.name)
@@ -1,66 +1,295 @@
-import asyncio
-import pickle
+import hashlib
+import unicodedata
+from contextlib import suppress
+from datetime import datetime, timedelta
+from itertools import chain
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 
-import torch
-from sentence_transformers import SentenceTransformer, util
+import numpy as np
 from sqlalchemy.ext.asyncio import AsyncSession
-from torch import Tensor
 
 from app.config import (
+    EMBEDDING_BACKFILL_BATCH_SIZE,
+    EMBEDDING_CACHE_DTYPE,
+    EMBEDDING_CACHE_VERSION,
+    EMBEDDING_INDEX_TTL_SECONDS,
     K_NEAREST_NEIGHBOURS,
     MODEL_DIRECTORY_NAME,
     MODEL_NAME,
     POSTS_SIMILARITY_THRESHOLD,
+    settings,
+)
+from app.database.crud import get_posts_by_ids
+from app.database.crud_embeddings import (
+    get_post_embeddings,
+    get_post_headers_after_date,
+    get_post_headers_by_ids,
+    get_posts_ids_after_date,
+    get_posts_without_embeddings,
+    save_post_embeddings,
 )
-from app.database.crud import get_all_posts_for_last_week
 from app.database.models import Post
-from app.database.redis import redis
+from app.database.redis import RedisUnavailableError, redis
+from app.database.sqlite import db
+from app.utils.cache import embedding_cache
+from app.utils.executor import InferenceExecutor
+from app.utils.index import EmbeddingIndex, normalize
+from app.utils.lazy_model import LazyModel
 
 path_to_model = Path(__file__).parent.parent.parent / '.model' / MODEL_DIRECTORY_NAME
-if path_to_model.exists():  # pragma: no cover
-    model = SentenceTransformer(model_name_or_path=str(path_to_model.absolute()))
-else:
-    model = SentenceTransformer(model_name_or_path=MODEL_NAME)
+path_to_numpy_model = path_to_model.with_name(f'{MODEL_DIRECTORY_NAME}.numpy')
+inference_executor = InferenceExecutor(
+    max_workers=settings.inference_workers,
+    max_queue_size=settings.inference_queue_size,
+)
+model = LazyModel(
+    path=path_to_model,
+    name=MODEL_NAME,
+    numpy_path=path_to_numpy_model if settings.embedding_engine == 'numpy' else None,
+    executor=inference_executor,
+)
 
+# Embeddings of the posts for the last week, shared by all requests of this worker
+post_index = EmbeddingIndex(ttl=EMBEDDING_INDEX_TTL_SECONDS)
 
-async def get_or_calculate_embedding_of_header(header: str) -> Tensor:
-    if await redis.exists(header):
-        pickled_tensor = await redis.get(header)
-        return pickle.loads(pickled_tensor)
 
-    embedding = model.encode(header, convert_to_tensor=True)
-    await redis.set(header, pickle.dumps(embedding))
-    return embedding
+def vector_to_bytes(vector: np.ndarray, dtype: str = '<f4') -> bytes:
+    return np.asarray(vector, dtype=dtype).tobytes()
 
 
-async def find_similar_recent_posts(
-    session: AsyncSession, original_post: Post
-) -> List[Post]:
-    recent_posts = await get_all_posts_for_last_week(session)
-    headers = [post.header for post in recent_posts]
+def vector_from_bytes(data: bytes, dtype: str = '<f4') -> np.ndarray:
+    # A read-only view over the bytes, only float16 vectors are copied to widen them
+    vector = np.frombuffer(data, dtype=dtype)
+    return vector if vector.dtype == np.float32 else vector.astype(np.float32)
 
-    original_header_embedding = await get_or_calculate_embedding_of_header(
-        original_post.header
-    )
-    all_headers_embeddings = await asyncio.gather(
-        *[get_or_calculate_embedding_of_header(header) for header in headers]
+
+def get_embedding_cache_key(header: str) -> str:
+    normalized_header = ' '.join(unicodedata.normalize('NFC', header).split())
+    header_hash = hashlib.sha256(normalized_header.encode()).hexdigest()
+    return (
+        f'embedding:{MODEL_NAME}:v{EMBEDDING_CACHE_VERSION}:'
+        f'{EMBEDDING_CACHE_DTYPE}:{header_hash}'
     )
 
-    # pylint: disable=no-member
-    cosine_scores = util.pytorch_cos_sim(
-        a=original_header_embedding.unsqueeze(dim=0),
-        b=torch.cat([tensor.unsqueeze(dim=0) for tensor in all_headers_embeddings]),
+
+async def get_or_calculate_embeddings_of_headers(
+    headers: List[str],
+) -> List[np.ndarray]:
+    header2key = {header: get_embedding_cache_key(header) for header in headers}
+    unique_keys = list(dict.fromkeys(header2key.values()))
+    # Embeddings already read by this worker are neither fetched nor decoded again
+    key2embedding: Dict[str, np.ndarray] = {}
+    for key in unique_keys:
+        embedding = embedding_cache.get(key)
+        if embedding is not None:
+            key2embedding[key] = embedding
+    remote_keys = [key for key in unique_keys if key not in key2embedding]
+    try:
+        remote_data = await redis.mget(remote_keys)
+    except RedisUnavailableError:
+        # Calculated here instead, only this worker keeps them until Redis is back
+        remote_data = [None] * len(remote_keys)
+    for key, data in zip(remote_keys, remote_data):
+        if data is not None:
+            key2embedding[key] = vector_from_bytes(data, EMBEDDING_CACHE_DTYPE)
+
+    key2missing_header = {
+        key: header for header, key in header2key.items() if key not in key2embedding
+    }
+    if key2missing_header:
+        embeddings = await model.encode_async(
+            list(key2missing_header.values()), convert_to_numpy=True
+        )
+        calculated = dict(zip(key2missing_header, embeddings))
+        with suppress(RedisUnavailableError):
+            await redis.mset(
+                {
+                    key: vector_to_bytes(embedding, EMBEDDING_CACHE_DTYPE)
+                    for key, embedding in calculated.items()
+                }
+            )
+        key2embedding.update(calculated)
+
+    for key in remote_keys:
+        embedding_cache.set(key, key2embedding[key])
+    return [key2embedding[header2key[header]] for header in headers]
+
+
+async def get_or_calculate_embedding_of_header(header: str) -> np.ndarray:
+    return (await get_or_calculate_embeddings_of_headers([header]))[0]
+
+
+async def calculate_and_save_post_embeddings(
+    posts: List[Post],
+) -> Dict[int, np.ndarray]:
+    # The model runs without a session, the single writer connection is only taken to
+    # store the results
+    embeddings = await get_or_calculate_embeddings_of_headers(
+        [post.header for post in posts]
     )
+    id2vector = {post.id: embedding for post, embedding in zip(posts, embeddings)}
+    async with db.create_session() as session:
+        await save_post_embeddings(
+            session,
+            {post_id: vector_to_bytes(vector) for post_id, vector in id2vector.items()},
+            model=MODEL_NAME,
+        )
+    return id2vector
+
+
+async def get_embeddings_of_posts(
+    session: AsyncSession, posts: List[Post]
+) -> List[np.ndarray]:
+    id2vector = {
+        post_id: vector_from_bytes(vector)
+        for post_id, vector in (
+            await get_post_embeddings(session, [post.id for post in posts], MODEL_NAME)
+        ).items()
+    }
+
+    # Only posts whose embedding job hasn't finished yet or that missed the backfill.
+    # They are stored by those, here they are calculated or read from the caches, so
+    # that reads don't wait for the single writer connection.
+    missing_posts = [post for post in posts if post.id not in id2vector]
+    if missing_posts:
+        embeddings = await get_or_calculate_embeddings_of_headers(
+            [post.header for post in missing_posts]
+        )
+        id2vector.update(zip((post.id for post in missing_posts), embeddings))
+
+    return [id2vector[post.id] for post in posts]
+
+
+async def embed_posts(posts_ids: List[int]) -> None:
+    async with db.create_session(read_only=True) as session:
+        posts = await get_post_headers_by_ids(session, posts_ids)
+    id2vector = await calculate_and_save_post_embeddings(posts)
+
+    # Until the index is loaded for the first time, new posts are read from the database
+    if post_index.is_loaded:
+        for post in posts:
+            post_index.add(post.id, id2vector[post.id], post.posted_at.timestamp())
+
+
+async def backfill_post_embeddings(
+    batch_size: int = EMBEDDING_BACKFILL_BATCH_SIZE,
+) -> None:
+    after_id = 0
+    while True:
+        async with db.create_session(read_only=True) as session:
+            posts = await get_posts_without_embeddings(
+                session, MODEL_NAME, limit=batch_size, after_id=after_id
+            )
+        if not posts:
+            break
+        await calculate_and_save_post_embeddings(posts)
+        after_id = posts[-1].id
+
 
-    post2score = {post: cosine_scores[0][i] for i, post in enumerate(recent_posts)}
-    filtered_posts = filter(
-        lambda post: post2score[post] > POSTS_SIMILARITY_THRESHOLD, recent_posts
+async def get_recent_posts_index(session: AsyncSession) -> EmbeddingIndex:
+    # Full reloads also pick up posts added or removed by other workers
+    start_date = datetime.utcnow() - timedelta(weeks=1)
+    if post_index.is_expired:
+        recent_posts = await get_post_headers_after_date(session, start_date)
+        post_index.load(
+            ids=[post.id for post in recent_posts],
+            embeddings=await get_embeddings_of_posts(session, recent_posts),
+            timestamps=[post.posted_at.timestamp() for post in recent_posts],
+        )
+    else:
+        post_index.remove_older_than(start_date.timestamp())
+
+    return post_index
+
+
+async def get_synced_recent_posts_index(session: AsyncSession) -> EmbeddingIndex:
+    # Lists of similar posts are stored for all workers, so posts added or removed by
+    # the other workers since the index was loaded are picked up before they are used
+    index = await get_recent_posts_index(session)
+    start_date = datetime.utcnow() - timedelta(weeks=1)
+    recent_posts_ids = set(await get_posts_ids_after_date(session, start_date))
+    indexed_posts_ids = set(index)
+    for post_id in indexed_posts_ids - recent_posts_ids:
+        index.remove(post_id)
+
+    missing_posts_ids = list(recent_posts_ids - indexed_posts_ids)
+    if missing_posts_ids:
+        missing_posts = await get_post_headers_by_ids(session, missing_posts_ids)
+        embeddings = await get_embeddings_of_posts(session, missing_posts)
+        for post, embedding in zip(missing_posts, embeddings):
+            index.add(post.id, embedding, post.posted_at.timestamp())
+    return index
+
+
+def remove_post_from_index(post_id: int) -> None:
+    post_index.remove(post_id)
+
+
+async def get_embeddings_of_indexed_posts(
+    session: AsyncSession, index: EmbeddingIndex, posts: List[Post]
+) -> List[np.ndarray]:
+    id2vector: Dict[int, np.ndarray] = {}
+    for post in posts:
+        vector = index.get(post.id)
+        if vector is not None:
+            id2vector[post.id] = vector
+
+    # Posts older than a week aren't in the index, their embeddings are stored
+    missing_posts = [post for post in posts if post.id not in id2vector]
+    if missing_posts:
+        embeddings = await get_embeddings_of_posts(session, missing_posts)
+        id2vector.update(zip((post.id for post in missing_posts), embeddings))
+
+    return [id2vector[post.id] for post in posts]
+
+
+async def find_similar_recent_posts(
+    session: AsyncSession, original_post: Post
+) -> List[Post]:
+    (similar_posts,) = await find_similar_recent_posts_for_many(
+        session, [original_post]
     )
-    sorted_posts = sorted(
-        filtered_posts, key=lambda post: post2score[post], reverse=True
+    return similar_posts
+
+
+async def find_similar_recent_posts_for_many(
+    session: AsyncSession, original_posts: List[Post]
+) -> List[List[Post]]:
+    if not original_posts:
+        return []
+
+    index = await get_recent_posts_index(session)
+    embeddings = await get_embeddings_of_indexed_posts(session, index, original_posts)
+
+    # A single (originals x recent posts) similarity matrix for all of them
+    similar_posts_ids = index.query(
+        np.stack(embeddings),
+        k=K_NEAREST_NEIGHBOURS,
+        threshold=POSTS_SIMILARITY_THRESHOLD,
+        exclude_ids=[post.id for post in original_posts],
     )
 
-    # Skip the first embedding since it corresponds to the original post itself
-    return sorted_posts[1 : 1 + K_NEAREST_NEIGHBOURS]
+    id2post = {
+        post.id: post
+        for post in await get_posts_by_ids(
+            session, list(dict.fromkeys(chain.from_iterable(similar_posts_ids)))
+        )
+    }
+    return [
+        [id2post[post_id] for post_id in ids if post_id in id2post]
+        for ids in similar_posts_ids
+    ]
+
+
+async def rerank_posts_by_meaning(
+    session: AsyncSession, query: str, posts: List[Post]
+) -> List[Post]:
+    if not posts:
+        return posts
+
+    query_embedding = await get_or_calculate_embedding_of_header(query)
+    embeddings = await get_embeddings_of_posts(session, posts)
+
+    scores = normalize(np.stack(embeddings)) @ normalize(query_embedding)
+    return [posts[i] for i in np.argsort(-scores, kind='stable')]
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import inspect, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app.config import PHOTO_CHUNK_SIZE, settings
+from app.database.models import Post
+
+PHOTO_HASH_PATTERN = re.compile('[0-9a-f]{64}')
+RANGE_PATTERN = re.compile(r'bytes=(\d*)-(\d*)')
+PHOTO_MEDIA_TYPES = {
+    b'\xff\xd8\xff': 'image/jpeg',
+    b'\x89PNG\r\n\x1a\n': 'image/png',
+    b'GIF87a': 'image/gif',
+    b'GIF89a': 'image/gif',
+}
+
+
+# Photos are files named by the SHA-256 of their content, so identical uploads are
+# stored once and a stored photo never changes
+class PhotoStore:
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+
+    def get_path(self, photo_hash: str) -> Path:
+        return self.directory / photo_hash[:2] / photo_hash
+
+    @staticmethod
+    def get_hash(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def save(self, data: bytes) -> str:
+        photo_hash = self.get_hash(data)
+        path = self.get_path(photo_hash)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Concurrent uploads of the same photo never see a partially written file
+            with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as file:
+                file.write(data)
+            os.replace(file.name, path)
+        return photo_hash
+
+    def find(self, photo_hash: str) -> Optional[Path]:
+        if not PHOTO_HASH_PATTERN.fullmatch(photo_hash):
+            return None
+        path = self.get_path(photo_hash)
+        return path if path.is_file() else None
+
+
+photo_store = PhotoStore(settings.photos_directory)
+
+
+async def save_photo(photo: Optional[bytes]) -> Optional[str]:
+    return await run_in_threadpool(photo_store.save, photo) if photo else None
+
+
+def get_photo_hash(photo: Optional[bytes]) -> Optional[str]:
+    return photo_store.get_hash(photo) if photo else None
+
+
+async def save_photos(photos: List[bytes]) -> None:
+    for photo in photos:
+        await run_in_threadpool(photo_store.save, photo)
+
+
+def get_photo_url(photo_hash: Optional[str]) -> Optional[str]:
+    return f'/photos/{photo_hash}' if photo_hash else None
+
+
+def guess_photo_media_type(path: Path) -> str:
+    with open(path, 'rb') as file:
+        head = file.read(8)
+    for signature, media_type in PHOTO_MEDIA_TYPES.items():
+        if head.startswith(signature):
+            return media_type
+    return 'application/octet-stream'
+
+
+def parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    # Only a single range is served partially, e.g. `bytes=0-99`, `bytes=100-`, `bytes=-100`.
+    # Other headers are ignored and the whole photo is sent, ranges out of it are errors.
+    match = RANGE_PATTERN.fullmatch(range_header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if start and end and int(end) < int(start):
+        return None
+    if start:
+        first, last = int(start), min(int(end or size - 1), size - 1)
+    else:
+        first, last = max(size - int(end), 0), size - 1
+    if first > last:
+        raise ValueError(range_header)
+    return first, last
+
+
+async def read_photo_chunks(path: Path, first: int, last: int) -> AsyncIterator[bytes]:
+    with open(path, 'rb') as file:
+        file.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = await run_in_threadpool(file.read, min(PHOTO_CHUNK_SIZE, remaining))
+            if not chunk:  # pragma: no cover
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def move_legacy_photos(session: AsyncSession) -> None:
+    # Photos used to be stored in the `photo` column of posts
+    columns = await session.run_sync(
+        lambda sync_session: inspect(sync_session.connection()).get_columns('Post')
+    )
+    if 'photo' not in {column['name'] for column in columns}:
+        return
+
+    result = await session.execute(
+        text('SELECT id, photo FROM Post WHERE photo IS NOT NULL')
+    )
+    for post_id, photo in result.all():
+        await session.execute(
+            update(Post)
+            .filter(Post.id == post_id)
+            .values(photo_hash=await save_photo(photo))
+        )
+    await session.execute(text('UPDATE Post SET photo = NULL'))
+    await session.commit()
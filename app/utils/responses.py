@@ -0,0 +1,21 @@
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+# `StreamingResponse` of Starlette 0.13 watches for disconnects by passing coroutines
+# to `asyncio.wait`, which newer Python versions refuse. The body is just sent chunk
+# by chunk here, a disconnected client makes `send` fail and stops the iteration.
+class ChunkedResponse(StreamingResponse):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                'type': 'http.response.start',
+                'status': self.status_code,
+                'headers': self.raw_headers,
+            }
+        )
+        async for chunk in self.body_iterator:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(self.charset)
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple, cast
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import (
+    EMBEDDING_BACKFILL_BATCH_SIZE,
+    K_NEAREST_NEIGHBOURS,
+    POSTS_SIMILARITY_THRESHOLD,
+)
+from app.database.crud import remove_post_by_id
+from app.database.crud_embeddings import (
+    are_similar_posts_calculated,
+    get_post_headers_after_date,
+    get_posts_ids_listing_similar_post,
+    get_similar_posts,
+    remove_expired_similar_posts,
+    save_similar_posts,
+)
+from app.database.models import Post
+from app.database.sqlite import db
+from app.utils.cache import invalidate, similar_posts_response_cache
+from app.utils.index import EmbeddingIndex
+from app.utils.ml import (
+    embed_posts,
+    find_similar_recent_posts,
+    get_synced_recent_posts_index,
+    remove_post_from_index,
+)
+
+# Similar posts of every post of the last week are stored in the `SimilarPost` table.
+# The lists only change when posts enter or leave the week, so they are updated then.
+
+
+def get_indexed_embeddings(index: EmbeddingIndex, posts_ids: List[int]) -> np.ndarray:
+    # Callers only pass ids of the posts that are in the index
+    return np.stack([cast(np.ndarray, index.get(post_id)) for post_id in posts_ids])
+
+
+async def update_similar_posts(
+    session: AsyncSession, index: EmbeddingIndex, posts_ids: List[int]
+) -> None:
+    posts_ids = [post_id for post_id in posts_ids if post_id in index]
+    for start in range(0, len(posts_ids), EMBEDDING_BACKFILL_BATCH_SIZE):
+        batch = posts_ids[start : start + EMBEDDING_BACKFILL_BATCH_SIZE]
+        embeddings = get_indexed_embeddings(index, batch)
+        similar_posts_ids = index.query(
+            embeddings,
+            k=K_NEAREST_NEIGHBOURS,
+            threshold=POSTS_SIMILARITY_THRESHOLD,
+            exclude_ids=batch,
+        )
+
+        similar_posts: Dict[int, List[Tuple[int, float]]] = {}
+        for post_id, embedding, ids in zip(batch, embeddings, similar_posts_ids):
+            similar_posts[post_id] = [
+                (similar_post_id, float(index.get(similar_post_id) @ embedding))
+                for similar_post_id in ids
+            ]
+        await save_similar_posts(session, similar_posts)
+        await invalidate(similar_posts_response_cache, batch)
+
+
+def get_posts_similar_to(index: EmbeddingIndex, posts_ids: List[int]) -> List[int]:
+    # Only lists of posts above the threshold can gain or lose the given posts
+    posts_ids = [post_id for post_id in posts_ids if post_id in index]
+    if not posts_ids:
+        return []
+
+    similar_posts_ids = index.query(
+        get_indexed_embeddings(index, posts_ids),
+        k=len(index),
+        threshold=POSTS_SIMILARITY_THRESHOLD,
+    )
+    return list(
+        {post_id for ids in similar_posts_ids for post_id in ids} - set(posts_ids)
+    )
+
+
+async def add_posts_to_similar_posts(posts_ids: List[int]) -> None:
+    await embed_posts(posts_ids)
+
+    # Syncing the index may run the model, the writer is only taken to store the lists
+    async with db.create_session(read_only=True) as session:
+        index = await get_synced_recent_posts_index(session)
+    async with db.create_session() as session:
+        await update_similar_posts(
+            session, index, posts_ids + get_posts_similar_to(index, posts_ids)
+        )
+
+
+async def remove_post_and_update_similar_posts(
+    session: AsyncSession, post_id: int
+) -> None:
+    # Lists that contain the post are read before its rows are removed together with
+    # it, the index of this worker may not have the post
+    affected_posts_ids = await get_posts_ids_listing_similar_post(session, post_id)
+    await remove_post_by_id(session, post_id)
+    remove_post_from_index(post_id)
+    index = await get_synced_recent_posts_index(session)
+    await update_similar_posts(session, index, affected_posts_ids)
+
+
+async def calculate_all_similar_posts() -> None:
+    start_date = datetime.utcnow() - timedelta(weeks=1)
+    async with db.create_session(read_only=True) as session:
+        index = await get_synced_recent_posts_index(session)
+        recent_posts = await get_post_headers_after_date(session, start_date)
+    async with db.create_session() as session:
+        await update_similar_posts(session, index, [post.id for post in recent_posts])
+
+
+async def expire_similar_posts() -> None:
+    start_date = datetime.utcnow() - timedelta(weeks=1)
+    async with db.create_session() as session:
+        affected_posts_ids = await remove_expired_similar_posts(session, start_date)
+    async with db.create_session(read_only=True) as session:
+        index = await get_synced_recent_posts_index(session)
+    async with db.create_session() as session:
+        await update_similar_posts(session, index, affected_posts_ids)
+
+
+async def get_similar_recent_posts(session: AsyncSession, post: Post) -> List[Post]:
+    start_date = datetime.utcnow() - timedelta(weeks=1)
+    similar_posts = await get_similar_posts(session, post.id, start_date)
+    if similar_posts:
+        return similar_posts
+
+    # Lists are only kept for posts of the last week that this worker has indexed
+    index = await get_synced_recent_posts_index(session)
+    if post.id not in index:
+        return await find_similar_recent_posts(session, post)
+
+    # Empty lists are only calculated once, they are marked when they are stored
+    if await are_similar_posts_calculated(session, post.id):
+        return []
+
+    # The list is stored through a short writer session, the read session doesn't see it
+    async with db.create_session() as write_session:
+        await update_similar_posts(write_session, index, [post.id])
+    return await find_similar_recent_posts(session, post)
@@ -0,0 +1,89 @@
+import asyncio
+from collections import deque
+from typing import Deque, List, Optional
+
+from app.config import (
+    VIEW_BUFFER_BATCH_SIZE,
+    VIEW_BUFFER_FLUSH_INTERVAL_SECONDS,
+    VIEW_BUFFER_MAX_SIZE,
+)
+from app.database.crud_history import View, update_browsing_histories
+from app.database.redis import RedisUnavailableError, redis
+
+
+# Views are written to the browsing history behind the requests that record them.
+# They wait in memory until a batch is full or the flush interval passes, and then
+# a background task writes the whole batch with one pipeline. Views that don't fit
+# into the buffer are counted as overflowed, ones that failed to be written as dropped.
+# While Redis is known to be down, views are kept in the buffer until it is back.
+class ViewBuffer:
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float) -> None:
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flushed = 0
+        self.overflowed = 0
+        self.dropped = 0
+        self._views: Deque[View] = deque()
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._task: Optional['asyncio.Task[None]'] = None
+        self._stopping = False
+
+    def __len__(self) -> int:
+        return len(self._views)
+
+    def add(self, user_id: int, timestamp: float, post_id: int) -> None:
+        if len(self._views) >= self.max_size:
+            self.overflowed += 1
+            return
+        self._views.append(View(user_id, timestamp, post_id))
+        if len(self._views) >= self.batch_size and self._batch_ready:
+            self._batch_ready.set()
+
+    async def flush(self) -> None:
+        while self._views and redis.is_available:
+            batch: List[View] = [
+                self._views.popleft()
+                for _ in range(min(self.batch_size, len(self._views)))
+            ]
+            try:
+                failed = await update_browsing_histories(redis, batch)
+            except RedisUnavailableError:
+                self.dropped += len(batch)
+            else:
+                self.flushed += len(batch) - failed
+                self.dropped += failed
+
+    async def _run(self, batch_ready: asyncio.Event) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            batch_ready.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._batch_ready = asyncio.Event()
+        self._task = asyncio.create_task(self._run(self._batch_ready))
+
+    async def stop(self) -> None:
+        # Views recorded before the shutdown are still written
+        if self._task and self._batch_ready:
+            self._stopping = True
+            self._batch_ready.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def clear(self) -> None:
+        self._views.clear()
+        self.flushed = self.overflowed = self.dropped = 0
+
+
+view_buffer = ViewBuffer(
+    max_size=VIEW_BUFFER_MAX_SIZE,
+    batch_size=VIEW_BUFFER_BATCH_SIZE,
+    flush_interval=VIEW_BUFFER_FLUSH_INTERVAL_SECONDS,
+)
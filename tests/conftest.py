@@ -21,6 +21,9 @@ from app.schema import (
     UserResponseModel,
 )
 from app.utils.auth import get_password_hash
+from app.utils.cache import caches
+from app.utils.ml import post_index
+from app.utils.views import view_buffer
 
 
 @pytest.fixture()
@@ -43,10 +46,30 @@ async def init_redis(mocker):
         server=fakeredis.FakeServer()
     )
     mocker.patch.object(redis, 'redis', fake_redis_pool)
+    redis.breaker.record_success()
     yield
     await redis.close()
 
 
+@pytest.fixture(autouse=True)
+def clear_post_index():
+    yield
+    post_index.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_view_buffer():
+    yield
+    view_buffer.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_local_caches():
+    yield
+    for cache in caches.values():
+        cache.clear()
+
+
 @pytest.fixture
 @pytest.mark.usefixtures('init_sqlite', 'init_redis')
 async def client(test_app):
@@ -139,6 +162,7 @@ def post1(admin, datetime_utcnow):
         text='text1',
         author=admin,
         posted_at=datetime_utcnow,
+        comment_count=0,
     )
 
 
@@ -150,6 +174,7 @@ def post2(admin, datetime_utcnow):
         text='text2',
         author=admin,
         posted_at=datetime_utcnow,
+        comment_count=0,
     )
 
 
@@ -161,6 +186,7 @@ def post3(admin, datetime_utcnow):
         text='text3',
         author=admin,
         posted_at=datetime_utcnow,
+        comment_count=0,
     )
 
 
@@ -213,6 +239,7 @@ def post4(admin, datetime_utcnow):
         text='text4',
         author=admin,
         posted_at=datetime_utcnow,
+        comment_count=0,
     )
 
 
@@ -224,6 +251,7 @@ def post5(admin, datetime_utcnow):
         text='text5',
         author=admin,
         posted_at=datetime_utcnow,
+        comment_count=0,
     )
 
 
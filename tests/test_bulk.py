@@ -0,0 +1,193 @@
+# pylint: disable=redefined-outer-name
+
+import base64
+import json
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import undefer_group
+from starlette import status
+
+from app.database.crud import create_posts
+from app.database.models import Post, User
+from app.utils.ml import model
+from app.utils.photos import photo_store
+
+HEADERS = [
+    'USA starts withdrawal of troops from Afghanistan',
+    'Havertz double leaves Fulham in trouble',
+    'Manchester City could clinch the Football Premier League',
+]
+
+
+@pytest.fixture(autouse=True)
+def photos_directory(mocker, tmp_path):
+    mocker.patch.object(photo_store, 'directory', tmp_path)
+
+
+async def get_posts(session):
+    result = await session.execute(
+        select(Post).options(undefer_group('content')).order_by(Post.id)
+    )
+    return result.scalars().all()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin')
+async def test_add_new_posts(mocker, client, session, admin, admin_access_token):
+    encode = mocker.spy(model, 'encode')
+
+    resp = await client.post(
+        url='/posts/bulk',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+        json={
+            'posts': [
+                {'header': HEADERS[0], 'text': 'text1'},
+                {'text': 'text'},
+                {'header': HEADERS[1], 'text': 'text2', 'photo': 'not base64!'},
+                {
+                    'header': HEADERS[2],
+                    'text': 'text3',
+                    'photo': base64.b64encode(b'photo').decode(),
+                },
+            ]
+        },
+    )
+
+    assert resp.status_code == status.HTTP_201_CREATED
+    assert resp.json() == {
+        'posts': [
+            {'id': 1, 'error': None},
+            {'id': None, 'error': 'header: field required'},
+            {'id': None, 'error': 'photo: invalid base64'},
+            {'id': 2, 'error': None},
+        ]
+    }
+    posts = await get_posts(session)
+    assert [(post.id, post.header, post.author_id) for post in posts] == [
+        (1, HEADERS[0], admin.id),
+        (2, HEADERS[2], admin.id),
+    ]
+    assert photo_store.get_path(posts[1].photo_hash).read_bytes() == b'photo'
+    # New headers are embedded together by the background task
+    assert encode.call_count == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin')
+async def test_add_new_posts_multipart(client, session, admin_access_token):
+    resp = await client.post(
+        url='/posts/bulk',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+        data={
+            'posts': json.dumps(
+                [
+                    {'header': HEADERS[0], 'text': 'text1', 'photo': 'photo1'},
+                    {'header': HEADERS[1], 'text': 'text2', 'photo': 'photo2'},
+                ]
+            )
+        },
+        files={'photo1': ('photo1.png', b'photo')},
+    )
+
+    assert resp.json() == {
+        'posts': [
+            {'id': 1, 'error': None},
+            {'id': None, 'error': 'photo: file photo2 is missing'},
+        ]
+    }
+    (post,) = await get_posts(session)
+    assert photo_store.get_path(post.photo_hash).read_bytes() == b'photo'
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin')
+@pytest.mark.parametrize(
+    'data, files', [({}, {}), ({}, {'posts': ('posts.json', b'[]')})]
+)
+async def test_add_new_posts_multipart_without_posts_field(
+    client, admin_access_token, data, files
+):
+    resp = await client.post(
+        url='/posts/bulk',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+        data=data,
+        files={'photo1': ('photo1.png', b'photo'), **files},
+    )
+
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    assert resp.json() == {'detail': 'Posts must be sent as a form field'}
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin')
+async def test_photos_are_not_saved_when_posts_are_not_created(
+    mocker, client, admin_access_token, tmp_path
+):
+    mocker.patch(
+        'app.routers.posts.create_posts',
+        side_effect=OperationalError('INSERT', {}, Exception('database is locked')),
+    )
+
+    with pytest.raises(OperationalError):
+        await client.post(
+            url='/posts/bulk',
+            headers={'Authorization': f'Bearer {admin_access_token}'},
+            data={
+                'posts': json.dumps(
+                    [{'header': HEADERS[0], 'text': 'text', 'photo': 'photo1'}]
+                )
+            },
+            files={'photo1': ('photo1.png', b'photo')},
+        )
+
+    assert not any(tmp_path.iterdir())
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin')
+@pytest.mark.parametrize(
+    'body, detail',
+    [
+        ({'posts': 'post'}, 'Batch must be a list of posts'),
+        ([], 'Batch must be a list of posts'),
+        ({'posts': [{}] * 1001}, 'Batch can contain at most 1000 posts'),
+    ],
+)
+async def test_add_new_posts_invalid_batch(client, admin_access_token, body, detail):
+    resp = await client.post(
+        url='/posts/bulk',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+        json=body,
+    )
+
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    assert resp.json() == {'detail': detail}
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_user')
+async def test_add_new_posts_forbidden(client, user_access_token):
+    resp = await client.post(
+        url='/posts/bulk',
+        headers={'Authorization': f'Bearer {user_access_token}'},
+        json={'posts': []},
+    )
+
+    assert resp.status_code == status.HTTP_403_FORBIDDEN
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_create_posts_returns_ids_in_input_order(session, admin):
+    author = await session.get(User, admin.id)
+    posts = [{'header': header, 'text': 'text'} for header in reversed(HEADERS)]
+
+    posts_ids = await create_posts(session, posts, author)
+
+    assert posts_ids == [4, 5, 6]
+    assert [post.header for post in (await get_posts(session))[3:]] == list(
+        reversed(HEADERS)
+    )
+    assert await create_posts(session, [], author) == []
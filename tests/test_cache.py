@@ -0,0 +1,141 @@
+# pylint: disable=redefined-outer-name
+
+import asyncio
+import json
+
+import pytest
+from starlette import status
+
+from app.database.redis import redis
+from app.utils.cache import (
+    INVALIDATION_CHANNEL,
+    LocalCache,
+    caches,
+    invalidate,
+    listen_for_invalidations,
+)
+from app.utils.ml import get_or_calculate_embeddings_of_headers
+
+
+@pytest.fixture
+def cache():
+    yield LocalCache('test', max_size=2, ttl=60)
+    caches.pop('test')
+
+
+def test_least_recently_used_items_are_evicted(cache):
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert [cache.get(key) for key in ('a', 'b', 'c')] == [1, None, 3]
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_expired_items_are_missed(mocker, cache):
+    cache.set('a', 1)
+    mocker.patch('app.utils.cache.time.monotonic', return_value=float('inf'))
+
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_embeddings_are_read_from_redis_once(mocker):
+    await get_or_calculate_embeddings_of_headers(['header1', 'header2'])
+    mget = mocker.spy(redis, 'mget')
+
+    await get_or_calculate_embeddings_of_headers(['header2', 'header1'])
+
+    mget.assert_called_once_with([])
+    assert caches['embeddings'].hits == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_cached_post_is_invalidated_by_writes(client, admin_access_token, post1):
+    url = f'/posts/{post1.id}'
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+    await client.get(url=url, headers=headers)
+
+    await client.post(url=f'{url}/comments', headers=headers, data={'text': 'text'})
+    resp = await client.get(url=url, headers=headers)
+    assert resp.json()['comment_count'] == 1
+
+    await client.delete(url=url, headers=headers)
+    resp = await client.get(url=url, headers=headers)
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_two_more_posts')
+async def test_cached_similar_posts_are_invalidated_by_comments(
+    client, admin_access_token
+):
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+    resp = await client.get(url='/posts/4/similar', headers=headers)
+    similar_post_id = resp.json()[0]['id']
+
+    await client.post(
+        url=f'/posts/{similar_post_id}/comments', headers=headers, data={'text': 'text'}
+    )
+    resp = await client.get(url='/posts/4/similar', headers=headers)
+
+    assert resp.json()[0]['comment_count'] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_two_more_posts')
+async def test_cached_similar_posts_fields(client, admin_access_token):
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+    resp = await client.get(url='/posts/4/similar', headers=headers)
+    posts = resp.json()
+    assert posts
+
+    resp = await client.get(
+        url='/posts/4/similar', params={'fields': 'header'}, headers=headers
+    )
+
+    assert caches['similar_posts_responses'].hits == 1
+    assert resp.json() == [
+        {'id': post['id'], 'header': post['header']} for post in posts
+    ]
+
+
+@pytest.mark.asyncio
+async def test_invalidations_are_broadcast(cache):
+    listener = asyncio.create_task(listen_for_invalidations())
+    await asyncio.sleep(0.01)
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    # Sent by another worker
+    await redis.publish(
+        INVALIDATION_CHANNEL, json.dumps({'cache': 'test', 'keys': ['a']})
+    )
+    await asyncio.sleep(0.01)
+    assert [cache.get('a'), cache.get('b')] == [None, 2]
+
+    await invalidate(cache)
+    await asyncio.sleep(0.01)
+    assert len(cache) == 0
+    listener.cancel()
+
+
+@pytest.mark.asyncio
+async def test_malformed_invalidations_are_skipped(cache):
+    listener = asyncio.create_task(listen_for_invalidations())
+    await asyncio.sleep(0.01)
+    cache.set('a', 1)
+
+    for message in ['not json', json.dumps({'keys': ['a']}), json.dumps(['a'])]:
+        await redis.publish(INVALIDATION_CHANNEL, message)
+    await redis.publish(
+        INVALIDATION_CHANNEL, json.dumps({'cache': 'test', 'keys': ['a']})
+    )
+    await asyncio.sleep(0.01)
+
+    assert not listener.done()
+    assert cache.get('a') is None
+    listener.cancel()
@@ -6,6 +6,7 @@ from starlette import status
 
 from app.database.crud import InvalidPageNumException, get_comments_by_post_id_and_page
 from app.database.models import Comment
+from app.utils.common import encode_keyset_cursor
 
 
 @pytest.mark.asyncio
@@ -61,6 +62,7 @@ async def test_get_comments_page_one(
     assert resp.json() == {
         'page': 1,
         'total_pages': 2,
+        'next_cursor': encode_keyset_cursor(comment2),
         'comments': [
             {
                 'id': comment1.id,
@@ -102,6 +104,7 @@ async def test_get_comments_page_two(client, admin_access_token, post1, comment3
     assert resp.json() == {
         'page': 2,
         'total_pages': 2,
+        'next_cursor': None,
         'comments': [
             {
                 'id': comment3.id,
@@ -134,6 +137,7 @@ async def test_get_comments_all(
     assert resp.json() == {
         'page': 1,
         'total_pages': 1,
+        'next_cursor': None,
         'comments': [
             {
                 'id': comment1.id,
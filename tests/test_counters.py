@@ -0,0 +1,91 @@
+# pylint: disable=redefined-outer-name
+
+import pytest
+from sqlalchemy import event, select, update
+
+from app.database.crud import create_posts
+from app.database.crud_counters import (
+    POSTS_COUNTER,
+    get_comment_count,
+    get_counter,
+    reconcile_counters,
+)
+from app.database.models import Comment, Counter, Post
+from app.database.sqlite import db
+
+
+@pytest.fixture
+def count_statements():
+    statements = []
+
+    def before_cursor_execute(*args):
+        statements.append(args[2])
+
+    engines = [db.engine.sync_engine, db.read_engine.sync_engine]
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield statements
+    for engine in engines:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_counters_follow_writes(client, session, admin_access_token, post1):
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+    await client.post(url='/posts', headers=headers, data={'header': 'h', 'text': 't'})
+    await client.post(
+        url=f'/posts/{post1.id}/comments', headers=headers, data={'text': 'text'}
+    )
+    await client.delete(url='/posts/2', headers=headers)
+
+    assert await get_counter(session, POSTS_COUNTER) == 3
+    assert await get_comment_count(session, post1.id) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_bulk_inserted_posts_are_counted(session, admin):
+    await create_posts(session, [{'header': 'h1'}, {'header': 'h2'}], author=admin)
+
+    assert await get_counter(session, POSTS_COUNTER) == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_counters_are_rolled_back_with_writes(session, post1):
+    session.add(Comment(text='text', post_id=post1.id))
+    session.add(Post(header='header'))
+    await session.flush()
+    await session.rollback()
+
+    assert await get_counter(session, POSTS_COUNTER) == 3
+    assert await get_comment_count(session, post1.id) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts', 'add_three_comments')
+@pytest.mark.parametrize('url', ['/posts/recent?page=1', '/posts/1/comments?page=1'])
+async def test_total_pages_are_not_counted(
+    client, admin_access_token, count_statements, url
+):
+    resp = await client.get(
+        url=url, headers={'Authorization': f'Bearer {admin_access_token}'}
+    )
+
+    assert resp.json()['total_pages'] == 2
+    assert not any('count(' in statement for statement in count_statements)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts', 'add_three_comments')
+async def test_reconcile_counters(session, post1, post2):
+    await session.execute(update(Counter).values(value=100))
+    await session.execute(update(Post).values(comment_count=7))
+    await session.commit()
+
+    await reconcile_counters(session)
+
+    result = await session.execute(select(Post.id, Post.comment_count))
+    assert result.all() == [(post1.id, 3), (post2.id, 0), (3, 0)]
+    assert await get_counter(session, POSTS_COUNTER) == 3
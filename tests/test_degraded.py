@@ -0,0 +1,123 @@
+# pylint: disable=redefined-outer-name
+
+import asyncio
+
+import pytest
+from aioredis import MultiExecError, ReplyError
+from starlette import status
+
+from app.config import settings
+from app.database.crud_history import get_browsing_history_key
+from app.database.redis import RedisUnavailableError, redis
+from app.utils.ml import get_or_calculate_embeddings_of_headers
+from app.utils.views import ViewBuffer, view_buffer
+
+
+@pytest.fixture
+def redis_down():
+    # As if the last calls to Redis failed, the breaker rejects calls from now on
+    for _ in range(redis.breaker.failure_threshold):
+        redis.breaker.record_failure()
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_after_failures_in_a_row(mocker):
+    await redis.redis.set('key', b'value')
+    get = mocker.patch.object(redis.redis, 'get', side_effect=ConnectionRefusedError)
+    for _ in range(redis.breaker.failure_threshold):
+        with pytest.raises(RedisUnavailableError):
+            await redis.get('key')
+    assert not redis.is_available
+
+    # Calls fail fast without reaching Redis
+    with pytest.raises(RedisUnavailableError):
+        await redis.get('key')
+    assert get.call_count == redis.breaker.failure_threshold
+
+    # Calls are let through again after a while and close the breaker when they work
+    mocker.patch.object(redis.breaker, 'reset_timeout', 0)
+    mocker.stop(get)
+    assert await redis.get('key') == b'value'
+    assert redis.is_available
+
+
+@pytest.mark.asyncio
+async def test_slow_calls_time_out(mocker):
+    mocker.patch.object(settings, 'redis_timeout_seconds', 0.01)
+    mocker.patch.object(redis.redis, 'get', side_effect=lambda key: asyncio.sleep(1))
+
+    with pytest.raises(RedisUnavailableError):
+        await redis.get('key')
+    assert redis.breaker.failures == 1
+
+
+@pytest.mark.asyncio
+async def test_command_errors_dont_open_breaker():
+    await redis.redis.set('key', b'value')
+
+    with pytest.raises(ReplyError):
+        await redis.lrange('key', 0, -1)
+    assert redis.breaker.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_command_errors_in_pipelines_dont_open_breaker():
+    await redis.redis.set(get_browsing_history_key(1), b'value')
+    buffer = ViewBuffer(max_size=10, batch_size=10, flush_interval=60)
+    for _ in range(redis.breaker.failure_threshold + 1):
+        buffer.add(user_id=1, timestamp=1.0, post_id=1)
+        buffer.add(user_id=2, timestamp=1.0, post_id=1)
+        await buffer.flush()
+
+    assert redis.is_available
+    assert (buffer.flushed, buffer.dropped) == (6, 6)
+    assert await redis.zrangebyscore(get_browsing_history_key(2)) == [b'1']
+
+    with pytest.raises(MultiExecError):
+        async with redis.pipeline(transaction=True) as transaction:
+            transaction.rpush(get_browsing_history_key(1), b'value')
+    assert redis.breaker.failures == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts', 'redis_down')
+async def test_posts_are_served_while_redis_is_down(
+    mocker, client, admin_access_token, three_posts
+):
+    mocker.patch('app.utils.common.PAGE_SIZE', 2)
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+
+    resp = await client.get(url='/posts/1', headers=headers)
+    assert resp.status_code == status.HTTP_200_OK
+    resp = await client.get(url='/posts/1/similar', headers=headers)
+    assert resp.status_code == status.HTTP_200_OK
+
+    # Views are kept until Redis is back
+    await view_buffer.flush()
+    assert (len(view_buffer), view_buffer.dropped) == (1, 0)
+
+    # The feed falls back to the newest posts
+    resp = await client.get(url='/posts/feed', params={'page': 1}, headers=headers)
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json()['total_pages'] == 2
+    assert [post['id'] for post in resp.json()['posts']] == [
+        post.id for post in reversed(three_posts)
+    ][:2]
+    resp = await client.get(url='/posts/feed', params={'page': 3}, headers=headers)
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    resp = await client.get(url='/posts/feed', headers=headers)
+    assert len(resp.json()['posts']) == 3
+
+    resp = await client.get(url='/health')
+    assert not resp.json()['redis_available']
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('redis_down')
+async def test_embeddings_are_calculated_while_redis_is_down():
+    embeddings = await get_or_calculate_embeddings_of_headers(['header1', 'header2'])
+
+    assert len(embeddings) == 2
+    # Kept by this worker until Redis is back
+    (embedding,) = await get_or_calculate_embeddings_of_headers(['header1'])
+    assert embedding is embeddings[0]
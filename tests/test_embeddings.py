@@ -0,0 +1,146 @@
+import struct
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.config import MODEL_NAME
+from app.database.models import PostEmbedding
+from app.database.redis import redis
+from app.database.sqlite import db
+from app.utils.ml import (
+    backfill_post_embeddings,
+    embed_posts,
+    get_embedding_cache_key,
+    get_or_calculate_embedding_of_header,
+    model,
+    vector_from_bytes,
+    vector_to_bytes,
+)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_three_posts')
+async def test_backfill_post_embeddings(mocker, session, three_posts):
+    await backfill_post_embeddings(batch_size=2)
+
+    result = await session.execute(
+        select(PostEmbedding).order_by(PostEmbedding.post_id)
+    )
+    embeddings = result.scalars().all()
+    assert [embedding.post_id for embedding in embeddings] == [1, 2, 3]
+    assert {embedding.model for embedding in embeddings} == {MODEL_NAME}
+    for embedding, post in zip(embeddings, three_posts):
+        assert np.allclose(
+            vector_from_bytes(embedding.vector), model.encode(post.header)
+        )
+    # Writes of the app go through a single connection, which the read would hold
+    await session.commit()
+
+    # Changing the model invalidates the stored embeddings
+    mocker.patch('app.utils.ml.MODEL_NAME', 'another_model')
+    await backfill_post_embeddings()
+
+    result = await session.execute(select(PostEmbedding.model).distinct())
+    assert result.scalars().all() == ['another_model']
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_three_posts')
+async def test_writer_is_free_while_the_model_runs(mocker):
+    checked_out = []
+    encode_async = model.encode_async
+
+    async def encode(*args, **kwargs):
+        checked_out.append(db.engine.sync_engine.pool.checkedout())
+        return await encode_async(*args, **kwargs)
+
+    mocker.patch.object(model, 'encode_async', side_effect=encode)
+    await embed_posts([1])
+    await backfill_post_embeddings()
+
+    assert checked_out == [0, 0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_get_similar_posts_uses_stored_embeddings(
+    mocker, client, admin_access_token, post2, post3
+):
+    await backfill_post_embeddings()
+    await redis.redis.flushdb()
+    encode = mocker.spy(model, 'encode')
+
+    resp = await client.get(
+        url=f'/posts/{post2.id}/similar',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert [post['id'] for post in resp.json()] == [post3.id]
+    encode.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin')
+async def test_post_embedding_is_stored_on_write(
+    client, session, admin_access_token, post1
+):
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+    await client.post(
+        url='/posts', headers=headers, data={'header': post1.header, 'text': post1.text}
+    )
+
+    result = await session.execute(select(PostEmbedding))
+    embedding = result.scalars().one()
+    assert embedding.post_id == post1.id
+    assert embedding.model == MODEL_NAME
+    assert np.allclose(vector_from_bytes(embedding.vector), model.encode(post1.header))
+    await session.commit()
+
+    await client.delete(url=f'/posts/{post1.id}', headers=headers)
+
+    result = await session.execute(select(PostEmbedding))
+    assert result.scalars().first() is None
+
+
+def test_vector_codec():
+    vector = np.array([0.5, -1.25, 3.0], dtype=np.float32)
+
+    data = vector_to_bytes(vector)
+    assert data == struct.pack('<3f', *vector)
+
+    decoded = vector_from_bytes(data)
+    assert decoded.dtype == np.float32
+    assert not decoded.flags.owndata
+    assert np.array_equal(decoded, vector)
+
+    half_precision = vector_from_bytes(vector_to_bytes(vector, '<f2'), '<f2')
+    assert half_precision.dtype == np.float32
+    assert np.array_equal(half_precision, vector)
+
+
+def test_embedding_cache_key(mocker):
+    key = get_embedding_cache_key('Havertz double  leaves Fulham in trouble ')
+
+    assert key == get_embedding_cache_key(' Havertz double leaves Fulham in trouble')
+    assert key != get_embedding_cache_key('Havertz double leaves Fulham')
+    assert key.startswith(f'embedding:{MODEL_NAME}:v1:<f4:')
+
+    mocker.patch('app.utils.ml.MODEL_NAME', 'another_model')
+    assert get_embedding_cache_key('Havertz double leaves Fulham in trouble') != key
+
+
+@pytest.mark.asyncio
+async def test_embeddings_are_cached_as_raw_bytes(mocker, post1):
+    embedding = await get_or_calculate_embedding_of_header(post1.header)
+
+    data = await redis.get(get_embedding_cache_key(post1.header))
+    assert data == vector_to_bytes(embedding)
+
+    mocker.patch('app.utils.ml.EMBEDDING_CACHE_DTYPE', '<f2')
+    encode = mocker.spy(model, 'encode')
+    await get_or_calculate_embedding_of_header(post1.header)
+
+    data = await redis.get(get_embedding_cache_key(post1.header))
+    assert data == vector_to_bytes(embedding, '<f2')
+    encode.assert_called_once()
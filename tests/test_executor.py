@@ -0,0 +1,60 @@
+# pylint: disable=too-many-arguments
+
+import asyncio
+import threading
+
+import pytest
+from starlette import status
+
+from app.database.crud_history import update_browsing_history
+from app.database.redis import redis
+from app.utils.executor import InferenceExecutor, InferenceQueueFullError
+from app.utils.ml import model
+
+
+@pytest.mark.asyncio
+async def test_executor_runs_jobs_off_the_event_loop():
+    executor = InferenceExecutor(max_workers=2, max_queue_size=0)
+
+    thread_id = await executor.run(threading.get_ident)
+
+    assert thread_id != threading.get_ident()
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_executor_rejects_jobs_when_queue_is_full():
+    executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+    release = threading.Event()
+
+    running = asyncio.ensure_future(executor.run(release.wait))
+    waiting = asyncio.ensure_future(executor.run(sum, [1, 2]))
+    await asyncio.sleep(0)
+    with pytest.raises(InferenceQueueFullError):
+        await executor.run(sum, [3])
+
+    release.set()
+    assert await running
+    assert await waiting == 3
+    # Slots of the finished jobs are free again
+    assert await executor.run(sum, [3]) == 3
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_get_feed_when_inference_queue_is_full(
+    client, mocker, admin, admin_access_token, post2, datetime_utcnow
+):
+    await update_browsing_history(
+        redis, admin.id, datetime_utcnow.timestamp(), post2.id
+    )
+    mocker.patch.object(model, 'encode_async', side_effect=InferenceQueueFullError)
+
+    resp = await client.get(
+        url='/posts/feed',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert resp.headers['Retry-After'] == '1'
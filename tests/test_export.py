@@ -0,0 +1,121 @@
+# pylint: disable=too-many-arguments
+
+import json
+from datetime import timedelta
+
+import pytest
+from starlette import status
+
+from app.database.models import Post
+from app.database.sqlite import db
+from app.utils import export
+from app.utils.export import export_posts
+
+
+def read_ndjson(resp):
+    return [json.loads(line) for line in resp.text.splitlines()]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_export_posts(client, admin, admin_access_token, post1, post2, post3):
+    resp = await client.get(
+        url='/export/posts',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.headers['content-type'] == 'application/x-ndjson'
+    assert read_ndjson(resp) == [
+        {
+            'id': post.id,
+            'author_id': admin.id,
+            'header': post.header,
+            'text': post.text,
+            'photo_url': None,
+            'posted_at': post.posted_at.isoformat(),
+        }
+        for post in (post1, post2, post3)
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_export_posts_since(
+    client, session, admin_access_token, post1, datetime_utcnow
+):
+    post = await session.get(Post, post1.id)
+    post.posted_at = datetime_utcnow + timedelta(days=1)
+    await session.commit()
+
+    resp = await client.get(
+        url='/export/posts',
+        params={'since': (datetime_utcnow + timedelta(hours=1)).isoformat()},
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert [post['id'] for post in read_ndjson(resp)] == [post1.id]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts', 'add_three_comments')
+async def test_export_comments(client, admin, admin_access_token, post1, comment1):
+    resp = await client.get(
+        url='/export/comments',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    comments = read_ndjson(resp)
+    assert [comment['id'] for comment in comments] == [1, 2, 3]
+    assert comments[0] == {
+        'id': comment1.id,
+        'author_id': admin.id,
+        'post_id': post1.id,
+        'text': comment1.text,
+        'posted_at': comment1.posted_at.isoformat(),
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_export_posts_is_sent_in_batches(mocker):
+    mocker.patch('app.database.crud_export.EXPORT_BATCH_SIZE', 2)
+
+    chunks = [chunk async for chunk in export_posts(since=None)]
+
+    assert [chunk.count(b'\n') for chunk in chunks] == [2, 1]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_export_holds_a_single_read_connection(
+    mocker, client, admin_access_token
+):
+    checked_out = []
+    stream_posts_since = export.stream_posts_since
+
+    async def stream(session, since):
+        checked_out.append(db.read_engine.sync_engine.pool.checkedout())
+        return await stream_posts_since(session, since)
+
+    mocker.patch.object(export, 'stream_posts_since', side_effect=stream)
+    resp = await client.get(
+        url='/export/posts',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    # The stream hasn't read yet, the auth check has released its connection
+    assert len(read_ndjson(resp)) == 3
+    assert checked_out == [0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_user')
+@pytest.mark.parametrize('url', ['/export/posts', '/export/comments'])
+async def test_export_forbidden(client, user_access_token, url):
+    resp = await client.get(
+        url=url, headers={'Authorization': f'Bearer {user_access_token}'}
+    )
+
+    assert resp.status_code == status.HTTP_403_FORBIDDEN
+    assert resp.json() == {'detail': 'Only admins can export data'}
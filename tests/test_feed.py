@@ -0,0 +1,100 @@
+# pylint: disable=too-many-arguments
+
+import pytest
+from starlette import status
+
+from app.database.crud_history import update_browsing_history
+from app.database.redis import redis
+from app.utils import ml
+from app.utils.feed import encode_cursor
+from app.utils.ml import find_similar_recent_posts, find_similar_recent_posts_for_many
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_similar_posts_for_many_match_single_queries(
+    session, post1, post2, post3
+):
+    posts = [post1, post2, post3]
+
+    similar_posts = await find_similar_recent_posts_for_many(session, posts)
+
+    assert similar_posts == [
+        await find_similar_recent_posts(session, post) for post in posts
+    ]
+    assert await find_similar_recent_posts_for_many(session, []) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_get_feed_excludes_viewed_posts(
+    client, mocker, admin, admin_access_token, post2, post3, datetime_utcnow
+):
+    for post in (post2, post3):
+        await update_browsing_history(
+            redis, admin.id, datetime_utcnow.timestamp(), post.id
+        )
+    get_embeddings = mocker.spy(ml, 'get_embeddings_of_posts')
+
+    resp = await client.get(
+        url='/posts/feed',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {
+        'page': 1,
+        'total_pages': 1,
+        'next_cursor': None,
+        'posts': [],
+    }
+    # Recent posts are embedded once for all viewed posts, not once per viewed post
+    assert get_embeddings.call_count == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_get_feed_pages_from_snapshot(
+    client, mocker, admin_access_token, post1, post3
+):
+    mocker.patch('app.utils.common.PAGE_SIZE', 1)
+    rank_feed = mocker.patch(
+        'app.utils.feed.rank_feed', return_value=[post3.id, post1.id]
+    )
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+
+    resp = await client.get(url='/posts/feed?page=1', headers=headers)
+    first_page = resp.json()
+    assert [post['id'] for post in first_page['posts']] == [post3.id]
+    assert first_page['total_pages'] == 2
+
+    resp = await client.get(
+        url='/posts/feed', params={'cursor': first_page['next_cursor']}, headers=headers
+    )
+    assert resp.json()['page'] == 2
+    assert [post['id'] for post in resp.json()['posts']] == [post1.id]
+    assert resp.json()['next_cursor'] is None
+
+    resp = await client.get(url='/posts/feed?page=2', headers=headers)
+    assert [post['id'] for post in resp.json()['posts']] == [post1.id]
+    assert rank_feed.call_count == 1
+
+    resp = await client.get(url='/posts/feed?page=1&refresh=true', headers=headers)
+    assert resp.json()['next_cursor'] != first_page['next_cursor']
+    assert rank_feed.call_count == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin')
+@pytest.mark.parametrize(
+    'cursor', ['garbage', encode_cursor('missing', 0), encode_cursor('missing', -1)]
+)
+async def test_get_feed_invalid_cursor(client, admin_access_token, cursor):
+    resp = await client.get(
+        url='/posts/feed',
+        params={'cursor': cursor},
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    assert resp.json() == {'detail': 'Cursor is invalid or expired'}
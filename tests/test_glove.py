@@ -0,0 +1,54 @@
+# pylint: disable=redefined-outer-name
+import numpy as np
+import pytest
+
+from app.utils.glove import GloveEmbeddingEngine, export_word_embeddings
+from app.utils.lazy_model import LazyModel
+from app.utils.ml import model, path_to_model
+
+HEADERS = [
+    'Manchester City could clinch the Premier League',
+    'Real Madrid vs. Osasuna: who will win?',
+    'BREAKING NEWS from St. Petersburg',
+    'unknown words only',
+    '',
+]
+
+
+@pytest.fixture()
+def numpy_model(tmp_path):
+    return LazyModel(path=path_to_model, name=model.name, numpy_path=tmp_path / 'glove')
+
+
+def test_numpy_engine_matches_sentence_transformer(numpy_model):
+    sentence_transformer = LazyModel(path=path_to_model, name=model.name)
+
+    expected = sentence_transformer.encode(HEADERS, convert_to_numpy=True)
+    actual = numpy_model.encode(HEADERS, convert_to_numpy=True)
+
+    assert isinstance(numpy_model.get(), GloveEmbeddingEngine)
+    assert actual.shape == expected.shape
+    assert np.allclose(actual, expected, atol=1e-6)
+    assert np.allclose(numpy_model.encode(HEADERS[0]), expected[0], atol=1e-6)
+    assert not actual[-1].any()
+
+
+def test_numpy_engine_maps_converted_weights(numpy_model):
+    numpy_model.get()
+
+    # Later starts only read the converted files, the original model isn't needed
+    lazy_model = LazyModel(
+        path=path_to_model / 'missing',
+        name='missing',
+        numpy_path=numpy_model.numpy_path,
+    )
+    engine = lazy_model.get()
+
+    assert isinstance(engine, GloveEmbeddingEngine)
+    assert isinstance(engine.embeddings, np.memmap)
+    assert np.array_equal(lazy_model.encode(HEADERS), numpy_model.encode(HEADERS))
+
+
+def test_export_skips_models_without_word_embeddings(tmp_path):
+    assert not export_word_embeddings([object()], tmp_path / 'glove')
+    assert not (tmp_path / 'glove').exists()
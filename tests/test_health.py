@@ -0,0 +1,51 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from starlette import status
+
+from app.utils.lazy_model import LazyModel
+from app.utils.ml import model, path_to_model
+
+
+@pytest.mark.asyncio
+async def test_get_health(client):
+    resp = await client.get(url='/health')
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {
+        'status': 'ok',
+        'model_ready': model.is_loaded,
+        'redis_available': True,
+        'view_buffer': {'buffered': 0, 'flushed': 0, 'overflowed': 0, 'dropped': 0},
+        'caches': {
+            name: {'size': 0, 'hits': 0, 'misses': 0, 'hit_rate': None}
+            for name in ('embeddings', 'post_responses', 'similar_posts_responses')
+        },
+    }
+
+
+def test_app_import_does_not_load_model():
+    code = (
+        'import sys; import app.factory, app.utils.ml as ml; '
+        "assert not ml.model.is_loaded; assert 'torch' not in sys.modules"
+    )
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        env={**os.environ, 'SECRET_KEY': 'secret'},
+        capture_output=True,
+        check=False,
+    )
+    assert result.returncode == 0, result.stderr.decode()
+
+
+@pytest.mark.asyncio
+async def test_model_warmup():
+    lazy_model = LazyModel(path=path_to_model, name=model.name)
+    assert not lazy_model.is_loaded
+
+    await lazy_model.warmup()
+
+    assert lazy_model.is_loaded
+    assert lazy_model.get() is lazy_model.get()
@@ -0,0 +1,73 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database.crud_history import (
+    get_browsing_history_key,
+    get_recently_viewed_posts_for_last_week,
+    move_browsing_history,
+    move_legacy_browsing_history,
+    sweep_browsing_history,
+    update_browsing_history,
+)
+from app.database.redis import redis
+
+
+@pytest.mark.asyncio
+async def test_browsing_history_is_capped_and_expires(mocker):
+    mocker.patch('app.database.crud_history.BROWSING_HISTORY_MAX_SIZE', 2)
+    for post_id in range(1, 5):
+        await update_browsing_history(redis, 1, float(post_id), post_id)
+
+    key = get_browsing_history_key(1)
+    assert await redis.zrangebyscore(key) == [b'3', b'4']
+    assert await redis.redis.ttl(key) > 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_old_views_are_swept(session, admin, post1, post2):
+    now = datetime.utcnow().timestamp()
+    two_weeks_ago = (datetime.utcnow() - timedelta(weeks=2)).timestamp()
+    await update_browsing_history(redis, admin.id, two_weeks_ago, post1.id)
+    await update_browsing_history(redis, admin.id, now, post2.id)
+    await update_browsing_history(redis, 123, two_weeks_ago, post1.id)
+    await redis.redis.set(get_browsing_history_key(456), b'value')
+
+    # Older views are skipped by reads even before they are swept
+    posts = await get_recently_viewed_posts_for_last_week(session, redis, admin.id, now)
+    assert [post.id for post in posts] == [post2.id]
+
+    await sweep_browsing_history(redis, now)
+
+    assert await redis.zrangebyscore(get_browsing_history_key(admin.id)) == [
+        str(post2.id).encode()
+    ]
+    assert await redis.zrangebyscore(get_browsing_history_key(123)) == []
+
+
+@pytest.mark.asyncio
+async def test_move_legacy_browsing_history():
+    await redis.redis.zadd(1, 1.0, b'10')
+    await redis.redis.set(2, b'value')
+
+    await move_legacy_browsing_history(redis)
+
+    assert not await redis.exists(1)
+    assert await redis.zrangebyscore(get_browsing_history_key(1)) == [b'10']
+    assert await redis.redis.ttl(get_browsing_history_key(1)) > 0
+    assert await redis.get(2) == b'value'
+
+
+@pytest.mark.asyncio
+async def test_move_browsing_history_moved_by_another_worker():
+    await redis.redis.zadd(1, 1.0, b'10')
+    await redis.redis.zadd(get_browsing_history_key(1), 2.0, b'20')
+
+    # The key has been moved in the meantime
+    await move_browsing_history(redis, b'2', get_browsing_history_key(2))
+    # The history of the new key isn't overwritten
+    await move_browsing_history(redis, b'1', get_browsing_history_key(1))
+
+    assert redis.is_available
+    assert await redis.zrangebyscore(get_browsing_history_key(1)) == [b'20']
@@ -0,0 +1,89 @@
+# pylint: disable=redefined-outer-name
+
+import numpy as np
+import pytest
+
+from app.utils.index import INITIAL_CAPACITY, EmbeddingIndex
+
+
+@pytest.fixture
+def index():
+    index = EmbeddingIndex()
+    index.load(
+        ids=[1, 2, 3],
+        embeddings=[np.array([1.0, 0.0]), np.array([3.0, 1.0]), np.array([0.0, 2.0])],
+        timestamps=[10.0, 20.0, 30.0],
+    )
+    return index
+
+
+def test_rows_are_normalized(index):
+    assert index.matrix.dtype == np.float32
+    assert np.allclose(np.linalg.norm(index.matrix, axis=1), 1.0)
+    assert np.allclose(index.get(2), np.array([3.0, 1.0]) / np.sqrt(10.0))
+
+
+def test_query_returns_best_first_above_threshold(index):
+    assert index.query(np.array([1.0, 0.1]), k=3, threshold=0.0) == [[1, 2, 3]]
+    assert index.query(np.array([1.0, 0.1]), k=2, threshold=0.0) == [[1, 2]]
+    assert index.query(np.array([1.0, 0.1]), k=3, threshold=0.5) == [[1, 2]]
+
+
+def test_query_excludes_original_post(index):
+    assert index.query(np.array([1.0, 0.0]), k=1, threshold=0.0, exclude_ids=[1]) == [
+        [2]
+    ]
+
+
+def test_query_many_rows_at_once(index):
+    embeddings = np.array([[1.0, 0.1], [0.0, 1.0], [-1.0, 0.0]])
+
+    result = index.query(embeddings, k=2, threshold=0.3, exclude_ids=[None, 3, 1])
+
+    assert result == [[1, 2], [2], []]
+
+
+def test_query_empty_index():
+    assert EmbeddingIndex().query(np.array([1.0, 0.0]), k=3, threshold=0.0) == [[]]
+
+
+def test_remove_moves_last_row(index):
+    index.remove(1)
+    index.remove(123)
+
+    assert len(index) == 2
+    assert 1 not in index
+    assert np.allclose(index.matrix[0], [0.0, 1.0])
+    assert np.allclose(index.get(3), [0.0, 1.0])
+    assert index.get(1) is None
+
+
+def test_remove_older_than(index):
+    index.remove_older_than(20.0)
+    assert 1 not in index
+    assert 2 in index
+    assert 3 in index
+
+
+def test_add_grows_and_replaces(index):
+    for post_id in range(4, INITIAL_CAPACITY + 10):
+        index.add(post_id, np.array([1.0, 1.0]), timestamp=40.0)
+    index.add(1, np.array([0.0, 1.0]), timestamp=50.0)
+
+    assert len(index) == INITIAL_CAPACITY + 9
+    assert np.allclose(index.get(1), [0.0, 1.0])
+    assert np.allclose(index.get(2), np.array([3.0, 1.0]) / np.sqrt(10.0))
+
+
+def test_expiration(mocker, index):
+    assert not EmbeddingIndex().is_loaded
+    assert EmbeddingIndex().is_expired
+    assert not index.is_expired
+
+    index.ttl = 60
+    mocker.patch('app.utils.index.time.monotonic', return_value=index.loaded_at + 61)
+    assert index.is_expired
+
+    index.clear()
+    assert not index.is_loaded
+    assert len(index) == 0
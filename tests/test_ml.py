@@ -1,9 +1,21 @@
 # pylint: disable=too-many-arguments
 
+from datetime import datetime
+
+import numpy as np
 import pytest
 from starlette import status
 
+from app.database.crud_history import update_browsing_history
+from app.database.models import Post
 from app.database.redis import redis
+from app.utils.ml import (
+    find_similar_recent_posts,
+    get_or_calculate_embedding_of_header,
+    get_or_calculate_embeddings_of_headers,
+    model,
+    post_index,
+)
 
 
 @pytest.mark.asyncio
@@ -44,8 +56,9 @@ async def test_get_similar_posts_symmetry(client, admin_access_token, post2, pos
             'id': post3.id,
             'header': post3.header,
             'text': post3.text,
-            'photo': None,
+            'photo_url': None,
             'posted_at': str(post3.posted_at).replace(' ', 'T'),
+            'comment_count': 0,
             'author': {
                 'id': post3.author.id,
                 'username': post3.author.username,
@@ -65,8 +78,9 @@ async def test_get_similar_posts_symmetry(client, admin_access_token, post2, pos
             'id': post2.id,
             'header': post2.header,
             'text': post2.text,
-            'photo': None,
+            'photo_url': None,
             'posted_at': str(post2.posted_at).replace(' ', 'T'),
+            'comment_count': 0,
             'author': {
                 'id': post2.author.id,
                 'username': post2.author.username,
@@ -82,7 +96,9 @@ async def test_get_feed(
     client, admin, admin_access_token, post2, post3, datetime_utcnow
 ):
     # Update browsing history to get recommendations later
-    await redis.zadd(key=admin.id, score=datetime_utcnow.timestamp(), member=post2.id)
+    await update_browsing_history(
+        redis, admin.id, datetime_utcnow.timestamp(), post2.id
+    )
 
     resp = await client.get(
         url='/posts/feed',
@@ -93,13 +109,15 @@ async def test_get_feed(
     assert resp.json() == {
         'page': 1,
         'total_pages': 1,
+        'next_cursor': None,
         'posts': [
             {
                 'id': post3.id,
                 'header': post3.header,
                 'text': post3.text,
-                'photo': None,
+                'photo_url': None,
                 'posted_at': str(post3.posted_at).replace(' ', 'T'),
+                'comment_count': 0,
                 'author': {
                     'id': post3.author.id,
                     'username': post3.author.username,
@@ -116,7 +134,9 @@ async def test_get_feed_page_one(
     client, admin, admin_access_token, post2, post3, datetime_utcnow
 ):
     # Update browsing history to get recommendations later
-    await redis.zadd(key=admin.id, score=datetime_utcnow.timestamp(), member=post2.id)
+    await update_browsing_history(
+        redis, admin.id, datetime_utcnow.timestamp(), post2.id
+    )
 
     resp = await client.get(
         url='/posts/feed?page=1',
@@ -127,13 +147,15 @@ async def test_get_feed_page_one(
     assert resp.json() == {
         'page': 1,
         'total_pages': 1,
+        'next_cursor': None,
         'posts': [
             {
                 'id': post3.id,
                 'header': post3.header,
                 'text': post3.text,
-                'photo': None,
+                'photo_url': None,
                 'posted_at': str(post3.posted_at).replace(' ', 'T'),
+                'comment_count': 0,
                 'author': {
                     'id': post3.author.id,
                     'username': post3.author.username,
@@ -150,7 +172,9 @@ async def test_get_feed_invalid_page(
     client, admin, admin_access_token, post2, datetime_utcnow
 ):
     # Update browsing history to get recommendations later
-    await redis.zadd(key=admin.id, score=datetime_utcnow.timestamp(), member=post2.id)
+    await update_browsing_history(
+        redis, admin.id, datetime_utcnow.timestamp(), post2.id
+    )
 
     resp = await client.get(
         url='/posts/feed?page=123',
@@ -159,3 +183,61 @@ async def test_get_feed_invalid_page(
 
     assert resp.status_code == status.HTTP_400_BAD_REQUEST
     assert resp.json() == {'detail': 'Page number is too big'}
+
+
+@pytest.mark.asyncio
+async def test_embeddings_of_headers_are_batched(mocker, three_posts):
+    headers = [post.header for post in three_posts]
+    expected = [model.encode(header) for header in headers]
+    encode = mocker.spy(model, 'encode')
+    mget = mocker.spy(redis, 'mget')
+
+    calculated = await get_or_calculate_embeddings_of_headers(headers + headers[:1])
+    cached = await get_or_calculate_embeddings_of_headers(headers)
+
+    single = await get_or_calculate_embedding_of_header(headers[0])
+
+    encode.assert_called_once_with(headers, convert_to_numpy=True)
+    assert mget.call_count == 3
+    assert np.array_equal(single, calculated[0])
+    assert len(calculated) == len(headers) + 1
+    for embeddings in (calculated, cached):
+        for embedding, expected_embedding in zip(embeddings, expected):
+            assert np.allclose(embedding, expected_embedding, atol=1e-6)
+
+
+@pytest.mark.asyncio
+async def test_find_similar_posts_without_recent_posts(session, post1):
+    post = Post(id=post1.id, header=post1.header, posted_at=datetime(2020, 1, 1))
+    session.add(post)
+    await session.commit()
+
+    assert await find_similar_recent_posts(session, post) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_similar_posts_index_is_updated_incrementally(
+    client, admin_access_token, post2, post3
+):
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+    resp = await client.get(url=f'/posts/{post2.id}/similar', headers=headers)
+    assert [post['id'] for post in resp.json()] == [post3.id]
+    assert post_index.is_loaded
+
+    resp = await client.post(
+        url='/posts',
+        headers=headers,
+        data={'header': 'Real Madrid could win the Premier League', 'text': 'text'},
+    )
+    new_post_id = resp.json()['id']
+    assert new_post_id in post_index
+
+    resp = await client.get(url=f'/posts/{post2.id}/similar', headers=headers)
+    assert {post['id'] for post in resp.json()} == {post3.id, new_post_id}
+
+    await client.delete(url=f'/posts/{new_post_id}', headers=headers)
+    assert new_post_id not in post_index
+
+    resp = await client.get(url=f'/posts/{post2.id}/similar', headers=headers)
+    assert [post['id'] for post in resp.json()] == [post3.id]
@@ -0,0 +1,107 @@
+# pylint: disable=too-many-arguments
+
+import pytest
+from sqlalchemy import select
+from starlette import status
+
+from app.database.crud import InvalidPageNumException, PostsOnPage, get_posts_by_page
+from app.database.models import Comment, Post
+
+
+async def read_all_pages(client, url, headers, items_key):
+    resp = await client.get(url=url, params={'page': 1}, headers=headers)
+    pages = [[item['id'] for item in resp.json()[items_key]]]
+    while resp.json()['next_cursor']:
+        resp = await client.get(
+            url=url, params={'cursor': resp.json()['next_cursor']}, headers=headers
+        )
+        assert resp.json()['page'] is None
+        pages.append([item['id'] for item in resp.json()[items_key]])
+    return pages
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts', 'mock_page_size')
+async def test_get_posts_by_cursor(client, admin_access_token, post1, post2, post3):
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+
+    pages = await read_all_pages(client, '/posts/recent', headers, 'posts')
+
+    assert pages == [[post1.id, post2.id], [post3.id]]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures(
+    'add_admin', 'add_three_posts', 'add_three_comments', 'mock_page_size'
+)
+async def test_get_comments_by_cursor(
+    client, session, admin, admin_access_token, post1, post2, comment1, comment3
+):
+    # Comments of other posts are neither counted nor listed
+    session.add(Comment(id=4, text='comment4', author_id=admin.id, post_id=post2.id))
+    await session.commit()
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+
+    pages = await read_all_pages(
+        client, f'/posts/{post1.id}/comments', headers, 'comments'
+    )
+
+    assert pages == [[comment1.id, 2], [comment3.id]]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin')
+@pytest.mark.parametrize('url', ['/posts/recent', '/posts/1/comments'])
+async def test_get_listing_invalid_cursor(client, admin_access_token, url):
+    resp = await client.get(
+        url=url,
+        params={'cursor': 'garbage'},
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    assert resp.json() == {'detail': 'Cursor is invalid'}
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+@pytest.mark.parametrize('url', ['/posts/recent', '/posts/feed', '/posts/2/similar'])
+async def test_get_posts_sparse_fields(client, admin_access_token, url):
+    resp = await client.get(
+        url=url,
+        params={'fields': 'header,posted_at', 'page': 1},
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    posts = resp.json() if isinstance(resp.json(), list) else resp.json()['posts']
+    for post in posts:
+        assert set(post) == {'id', 'header', 'posted_at'}
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin')
+async def test_get_posts_unknown_fields(client, admin_access_token):
+    resp = await client.get(
+        url='/posts/recent',
+        params={'fields': 'header,password,secret'},
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert resp.status_code == status.HTTP_400_BAD_REQUEST
+    assert resp.json() == {'detail': 'Unknown fields: password, secret'}
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_three_posts')
+async def test_get_posts_invalid_page_dao(session):
+    with pytest.raises(InvalidPageNumException):
+        await get_posts_by_page(session, page=123)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_three_posts')
+async def test_get_posts_dao(session, post3):
+    posts = await get_posts_by_page(session, page=2)
+    target_post = await session.execute(select(Post).filter(Post.id == post3.id))
+    assert posts == PostsOnPage(posts=[target_post.scalars().first()], total_pages=2)
@@ -0,0 +1,160 @@
+# pylint: disable=redefined-outer-name
+
+import hashlib
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import OperationalError
+from starlette import status
+
+from app.database.models import Post
+from app.utils.photos import move_legacy_photos, photo_store
+
+PHOTO = b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 4
+PHOTO_HASH = hashlib.sha256(PHOTO).hexdigest()
+
+
+@pytest.fixture(autouse=True)
+def photos_directory(mocker, tmp_path):
+    mocker.patch.object(photo_store, 'directory', tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def add_photo():
+    photo_store.save(PHOTO)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin')
+async def test_identical_photos_are_stored_once(
+    client, session, admin_access_token, photos_directory
+):
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+    for header in ('header1', 'header2'):
+        await client.post(
+            url='/posts',
+            headers=headers,
+            data={'header': header, 'text': 'text'},
+            files={'photo': ('photo.png', PHOTO)},
+        )
+
+    result = await session.execute(select(Post.photo_hash))
+    assert result.scalars().all() == [PHOTO_HASH, PHOTO_HASH]
+    assert [path.name for path in photos_directory.rglob('*')] == [
+        PHOTO_HASH[:2],
+        PHOTO_HASH,
+    ]
+
+    resp = await client.get(url='/posts/recent', headers=headers)
+    photo_url = resp.json()['posts'][0]['photo_url']
+    assert photo_url == f'/photos/{PHOTO_HASH}'
+
+    resp = await client.get(url=photo_url)
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.content == PHOTO
+    assert resp.headers['content-type'] == 'image/png'
+    assert resp.headers['etag'] == f'"{PHOTO_HASH}"'
+    assert resp.headers['content-length'] == str(len(PHOTO))
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin')
+async def test_photo_is_not_saved_when_post_is_not_created(
+    mocker, client, admin_access_token, photos_directory
+):
+    mocker.patch(
+        'app.routers.posts.create_post',
+        side_effect=OperationalError('INSERT', {}, Exception('database is locked')),
+    )
+
+    with pytest.raises(OperationalError):
+        await client.post(
+            url='/posts',
+            headers={'Authorization': f'Bearer {admin_access_token}'},
+            data={'header': 'header', 'text': 'text'},
+            files={'photo': ('photo.png', PHOTO)},
+        )
+
+    assert not any(photos_directory.iterdir())
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_photo')
+@pytest.mark.parametrize(
+    'range_header, first, last',
+    [('bytes=0-9', 0, 9), ('bytes=1000-', 1000, 1031), ('bytes=-8', 1024, 1031)],
+)
+async def test_get_photo_range(client, range_header, first, last):
+    resp = await client.get(
+        url=f'/photos/{PHOTO_HASH}', headers={'Range': range_header}
+    )
+
+    assert resp.status_code == status.HTTP_206_PARTIAL_CONTENT
+    assert resp.content == PHOTO[first : last + 1]
+    assert resp.headers['content-range'] == f'bytes {first}-{last}/{len(PHOTO)}'
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_photo')
+@pytest.mark.parametrize(
+    'range_header', ['bytes=a-b', 'bytes=10-5', 'bytes=-', 'bytes=0-1,5-6', 'items=0-1']
+)
+async def test_get_photo_invalid_range(client, range_header):
+    resp = await client.get(
+        url=f'/photos/{PHOTO_HASH}', headers={'Range': range_header}
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.content == PHOTO
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_photo')
+@pytest.mark.parametrize('range_header', [f'bytes={len(PHOTO)}-', 'bytes=-0'])
+async def test_get_photo_unsatisfiable_range(client, range_header):
+    resp = await client.get(
+        url=f'/photos/{PHOTO_HASH}', headers={'Range': range_header}
+    )
+
+    assert resp.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+    assert resp.headers['content-range'] == f'bytes */{len(PHOTO)}'
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_photo')
+async def test_get_photo_not_modified(client):
+    resp = await client.get(
+        url=f'/photos/{PHOTO_HASH}', headers={'If-None-Match': f'"{PHOTO_HASH}"'}
+    )
+
+    assert resp.status_code == status.HTTP_304_NOT_MODIFIED
+    assert resp.content == b''
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('photo_hash', ['0' * 64, '../../etc/passwd'])
+async def test_get_photo_not_found(client, photo_hash):
+    resp = await client.get(url=f'/photos/{photo_hash}')
+
+    assert resp.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_move_legacy_photos(session, post1, post2):
+    await session.execute(text('ALTER TABLE Post ADD COLUMN photo BLOB'))
+    await session.execute(
+        text('UPDATE Post SET photo = :photo WHERE id = :id'),
+        {'photo': PHOTO, 'id': post1.id},
+    )
+
+    await move_legacy_photos(session)
+
+    result = await session.execute(text('SELECT id, photo_hash, photo FROM Post'))
+    assert result.all() == [
+        (post1.id, PHOTO_HASH, None),
+        (post2.id, None, None),
+        (3, None, None),
+    ]
+    assert photo_store.get_path(PHOTO_HASH).read_bytes() == PHOTO
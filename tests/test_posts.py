@@ -2,17 +2,15 @@
 
 import pytest
 from sqlalchemy import select
+from sqlalchemy.orm import undefer_group
 from starlette import status
 
-from app.database.crud import (
-    InvalidPageNumException,
-    PostNotFoundException,
-    PostsOnPage,
-    get_posts_by_page,
-    remove_post_by_id,
-)
+from app.database.crud import PostNotFoundException, remove_post_by_id
+from app.database.crud_history import get_browsing_history_key
 from app.database.models import Post
 from app.database.redis import redis
+from app.utils.common import encode_keyset_cursor
+from app.utils.views import view_buffer
 
 
 @pytest.mark.asyncio
@@ -27,13 +25,15 @@ async def test_add_new_post(client, session, admin, admin_access_token, post1):
     assert resp.status_code == status.HTTP_201_CREATED
     assert resp.json() == {'id': post1.id}
 
-    result = await session.execute(select(Post).filter(Post.id == post1.id))
+    result = await session.execute(
+        select(Post).options(undefer_group('content')).filter(Post.id == post1.id)
+    )
     post_from_db = result.scalars().first()
 
     assert post_from_db.author_id == admin.id
     assert post_from_db.header == post1.header
     assert post_from_db.text == post1.text
-    assert post_from_db.photo is None
+    assert post_from_db.photo_hash is None
 
 
 @pytest.mark.asyncio
@@ -63,13 +63,15 @@ async def test_get_all_posts_for_last_week(
     assert resp.json() == {
         'page': 1,
         'total_pages': 1,
+        'next_cursor': None,
         'posts': [
             {
                 'id': post1.id,
                 'header': post1.header,
                 'text': post1.text,
-                'photo': None,
+                'photo_url': None,
                 'posted_at': str(post1.posted_at).replace(' ', 'T'),
+                'comment_count': 0,
                 'author': {
                     'id': post1.author.id,
                     'username': post1.author.username,
@@ -80,8 +82,9 @@ async def test_get_all_posts_for_last_week(
                 'id': post2.id,
                 'header': post2.header,
                 'text': post2.text,
-                'photo': None,
+                'photo_url': None,
                 'posted_at': str(post2.posted_at).replace(' ', 'T'),
+                'comment_count': 0,
                 'author': {
                     'id': post2.author.id,
                     'username': post2.author.username,
@@ -92,8 +95,9 @@ async def test_get_all_posts_for_last_week(
                 'id': post3.id,
                 'header': post3.header,
                 'text': post3.text,
-                'photo': None,
+                'photo_url': None,
                 'posted_at': str(post3.posted_at).replace(' ', 'T'),
+                'comment_count': 0,
                 'author': {
                     'id': post3.author.id,
                     'username': post3.author.username,
@@ -118,13 +122,15 @@ async def test_get_all_posts_for_last_week_page_one(
     assert resp.json() == {
         'page': 1,
         'total_pages': 2,
+        'next_cursor': encode_keyset_cursor(post2),
         'posts': [
             {
                 'id': post1.id,
                 'header': post1.header,
                 'text': post1.text,
-                'photo': None,
+                'photo_url': None,
                 'posted_at': str(post1.posted_at).replace(' ', 'T'),
+                'comment_count': 0,
                 'author': {
                     'id': post1.author.id,
                     'username': post1.author.username,
@@ -135,8 +141,9 @@ async def test_get_all_posts_for_last_week_page_one(
                 'id': post2.id,
                 'header': post2.header,
                 'text': post2.text,
-                'photo': None,
+                'photo_url': None,
                 'posted_at': str(post2.posted_at).replace(' ', 'T'),
+                'comment_count': 0,
                 'author': {
                     'id': post2.author.id,
                     'username': post2.author.username,
@@ -159,13 +166,15 @@ async def test_get_all_posts_for_last_week_page_two(client, admin_access_token,
     assert resp.json() == {
         'page': 2,
         'total_pages': 2,
+        'next_cursor': None,
         'posts': [
             {
                 'id': post3.id,
                 'header': post3.header,
                 'text': post3.text,
-                'photo': None,
+                'photo_url': None,
                 'posted_at': str(post3.posted_at).replace(' ', 'T'),
+                'comment_count': 0,
                 'author': {
                     'id': post3.author.id,
                     'username': post3.author.username,
@@ -237,7 +246,7 @@ async def test_remove_existing_post_forbidden(client, user_access_token):
 
 
 @pytest.mark.asyncio
-@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+@pytest.mark.usefixtures('add_admin', 'add_three_posts', 'add_three_comments')
 async def test_get_single_post(client, admin, admin_access_token, post1):
     resp = await client.get(
         url=f'/posts/{post1.id}',
@@ -249,8 +258,9 @@ async def test_get_single_post(client, admin, admin_access_token, post1):
         'id': post1.id,
         'header': post1.header,
         'text': post1.text,
-        'photo': None,
+        'photo_url': None,
         'posted_at': str(post1.posted_at).replace(' ', 'T'),
+        'comment_count': 3,
         'author': {
             'id': post1.author.id,
             'username': post1.author.username,
@@ -258,8 +268,11 @@ async def test_get_single_post(client, admin, admin_access_token, post1):
         },
     }
 
-    browsing_history = await redis.zrangebyscore(admin.id)
-    assert browsing_history == [str(post1.id).encode()]
+    # The view is only written by the next flush of the buffer
+    key = get_browsing_history_key(admin.id)
+    assert await redis.zrangebyscore(key) == []
+    await view_buffer.flush()
+    assert await redis.zrangebyscore(key) == [str(post1.id).encode()]
 
 
 @pytest.mark.asyncio
@@ -272,18 +285,3 @@ async def test_get_single_nonexistent_post(client, admin_access_token):
 
     assert resp.status_code == status.HTTP_404_NOT_FOUND
     assert resp.json() == {'detail': 'Post with id = 1234 was not found'}
-
-
-@pytest.mark.asyncio
-@pytest.mark.usefixtures('add_three_posts')
-async def test_get_posts_invalid_page_dao(session):
-    with pytest.raises(InvalidPageNumException):
-        await get_posts_by_page(session, page=123)
-
-
-@pytest.mark.asyncio
-@pytest.mark.usefixtures('add_three_posts')
-async def test_get_posts_dao(session, post3):
-    posts = await get_posts_by_page(session, page=2)
-    target_post = await session.execute(select(Post).filter(Post.id == post3.id))
-    assert posts == PostsOnPage(posts=[target_post.scalars().first()], total_pages=2)
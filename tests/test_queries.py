@@ -0,0 +1,180 @@
+# pylint: disable=redefined-outer-name
+# pylint: disable=too-many-arguments
+
+import re
+from datetime import datetime
+
+import pytest
+from sqlalchemy import event, inspect
+from starlette import status
+
+from app.database import crud, crud_embeddings, crud_export, crud_search
+from app.database.models import Comment, Post, User
+from app.database.sqlite import db
+from app.utils.cache import caches
+
+POSTS_NUM = 4
+
+
+@pytest.fixture
+def count_queries():
+    # Statements are recorded together with their parameters to be explained later
+    statements = []
+
+    def before_cursor_execute(*args):
+        statements.append((args[2], args[3]))
+
+    engines = [db.engine.sync_engine, db.read_engine.sync_engine]
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    yield statements
+    for engine in engines:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+async def read_stream(result):
+    return await (await result).all()
+
+
+@pytest.fixture
+def authors_num():
+    return POSTS_NUM
+
+
+@pytest.fixture
+@pytest.mark.usefixtures('add_admin')
+async def add_posts_of_many_authors(session, datetime_utcnow, authors_num):
+    # Authors other than the current user are missing in the session of a request
+    authors = [
+        User(username=f'author{i}', full_name=f'Author {i}', hashed_password='hash')
+        for i in range(1, authors_num + 1)
+    ]
+    for i in range(1, POSTS_NUM + 1):
+        author = authors[(i - 1) % authors_num]
+        post = Post(
+            id=i,
+            header=f'Football news {i}',
+            text=f'text{i}',
+            author=author,
+            posted_at=datetime_utcnow,
+        )
+        session.add(Comment(id=i, text=f'comment{i}', author=author, post_id=1))
+        session.add(post)
+    await session.commit()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_posts_of_many_authors')
+@pytest.mark.parametrize('authors_num', [1, POSTS_NUM])
+@pytest.mark.parametrize(
+    'url, items_key, queries_num',
+    [
+        ('/posts/recent', 'posts', 4),
+        ('/posts/recent?page=1', 'posts', 5),
+        ('/posts/1/comments', 'comments', 3),
+        ('/posts/1/comments?page=1', 'comments', 4),
+        ('/posts/feed?page=1&refresh=true', 'posts', 5),
+        ('/posts/1/similar', None, 6),
+    ],
+)
+async def test_listing_query_count_does_not_depend_on_authors(
+    client,
+    mocker,
+    admin_access_token,
+    count_queries,
+    authors_num,
+    url,
+    items_key,
+    queries_num,
+):
+    mocker.patch('app.utils.common.PAGE_SIZE', POSTS_NUM)
+    mocker.patch('app.utils.feed.rank_feed', return_value=list(range(1, POSTS_NUM + 1)))
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+    # The index and the similar posts are built by the first request only
+    await client.get(url=url, headers=headers)
+    for cache in caches.values():
+        cache.clear()
+    count_queries.clear()
+
+    resp = await client.get(url=url, headers=headers)
+
+    assert resp.status_code == status.HTTP_200_OK
+    items = resp.json()[items_key] if items_key else resp.json()
+    authors_ids = {item['author']['id'] for item in items}
+    assert len(authors_ids) == min(authors_num, len(items))
+    # Authors of the whole page are loaded by a single query
+    assert len(count_queries) == queries_num
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_posts_of_many_authors')
+async def test_content_is_only_read_when_requested(
+    client, admin_access_token, count_queries
+):
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+
+    await client.get(url='/posts/recent', params={'fields': 'header'}, headers=headers)
+    assert not any('"Post".text' in statement for statement, _ in count_queries)
+
+    await client.get(url='/posts/recent', params={'fields': 'text'}, headers=headers)
+    assert any('"Post".text' in statement for statement, _ in count_queries)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts', 'add_three_comments')
+@pytest.mark.parametrize(
+    'query',
+    [
+        lambda session: crud.get_post_by_id(session, 1),
+        lambda session: crud.get_posts_by_ids(session, [1, 2]),
+        crud.get_all_posts_for_last_week,
+        lambda session: crud.get_posts_by_page(session, 1),
+        lambda session: crud.get_posts_after_cursor(session, (datetime.min, 0), 2),
+        lambda session: crud.get_all_comments_by_post_id(session, 1),
+        lambda session: crud.get_comments_by_post_id_and_page(session, 1, 1),
+        lambda session: crud.get_comments_by_post_id_after_cursor(
+            session, 1, (datetime.min, 0), 2
+        ),
+        lambda session: crud_embeddings.get_post_embeddings(session, [1, 2], 'model'),
+        lambda session: crud_embeddings.get_similar_posts(session, 1, datetime.min),
+        lambda session: crud_embeddings.get_posts_without_embeddings(
+            session, 'model', limit=2
+        ),
+        lambda session: crud_embeddings.remove_expired_similar_posts(
+            session, datetime.min
+        ),
+        lambda session: crud_search.search_posts(session, 'text', limit=2),
+        lambda session: read_stream(
+            crud_export.stream_posts_since(session, datetime.min)
+        ),
+        lambda session: read_stream(
+            crud_export.stream_comments_since(session, datetime.min)
+        ),
+    ],
+)
+async def test_crud_queries_do_not_scan_tables(session, count_queries, query):
+    await query(session)
+
+    assert count_queries
+    async with db.read_engine.connect() as conn:
+        for statement, parameters in list(count_queries):
+            result = await conn.exec_driver_sql(
+                f'EXPLAIN QUERY PLAN {statement}', parameters
+            )
+            # Scans of a whole index in its order are fine, e.g. for the page offset
+            for plan in result.all():
+                # Older versions of SQLite leave out `TABLE`
+                assert not re.match(r'SCAN (TABLE )?\w+$', plan.detail), statement
+
+
+@pytest.mark.asyncio
+async def test_missing_indexes_are_created():
+    async with db.engine.begin() as conn:
+        await conn.exec_driver_sql('DROP INDEX ix_Post_posted_at_id')
+        await conn.run_sync(db.create_missing_indexes)
+
+        indexes = await conn.run_sync(
+            lambda sync_conn: inspect(sync_conn).get_indexes('Post')
+        )
+
+    assert [index['name'] for index in indexes] == ['ix_Post_posted_at_id']
@@ -0,0 +1,47 @@
+import pytest
+
+from app.database.redis import redis
+
+
+@pytest.mark.asyncio
+async def test_single_key_operations():
+    assert not await redis.exists('key')
+    await redis.redis.set('key', b'value')
+
+    assert await redis.exists('key')
+    assert await redis.get('key') == b'value'
+
+
+@pytest.mark.asyncio
+async def test_multi_key_operations():
+    await redis.mset({'key1': b'value1', 'key2': b'value2'})
+
+    assert await redis.mget(['key1', 'missing', 'key2']) == [b'value1', None, b'value2']
+
+
+@pytest.mark.asyncio
+async def test_multi_key_operations_with_no_keys():
+    assert await redis.mget([]) == []
+    assert await redis.mset({}) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('transaction', [False, True])
+async def test_pipeline(transaction):
+    async with redis.pipeline(transaction=transaction) as pipe:
+        pipe.set('key', b'value')
+        value = pipe.get('key')
+        missing = pipe.get('missing')
+
+    assert await value == b'value'
+    assert await missing is None
+
+
+@pytest.mark.asyncio
+async def test_sorted_set_batch_operations():
+    await redis.redis.zadd('key1', 1, b'a', 2, b'b', 3, b'c')
+    await redis.redis.zadd('key2', 1, b'd')
+
+    assert await redis.zremrangebyscore_many(['key1', 'key2'], max=1) == [1, 1]
+    assert await redis.zrangebyscore('key1') == [b'b', b'c']
+    assert await redis.zrangebyscore('key2') == []
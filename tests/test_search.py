@@ -0,0 +1,118 @@
+import asyncio
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+from starlette import status
+
+from app.database.crud import create_posts
+from app.database.crud_search import search_posts, to_fts_query
+from app.database.models import Post
+from app.database.sqlite import db
+
+
+async def search(client, access_token, **params):
+    resp = await client.get(
+        url='/posts/search',
+        params=params,
+        headers={'Authorization': f'Bearer {access_token}'},
+    )
+    assert resp.status_code == status.HTTP_200_OK
+    return [post['id'] for post in resp.json()['posts']]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_two_more_posts')
+async def test_search_posts(client, admin_access_token, post4):
+    resp = await client.get(
+        url='/posts/search',
+        params={'q': 'breaking', 'fields': 'header'},
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert resp.status_code == status.HTTP_200_OK
+    assert resp.json() == {'posts': [{'id': post4.id, 'header': post4.header}]}
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_two_more_posts')
+async def test_search_posts_ranking(client, session, admin, admin_access_token):
+    await create_posts(session, [{'header': 'Weather', 'text': 'Russia'}], admin)
+
+    # Case is ignored and header matches come first
+    assert await search(client, admin_access_token, q='russia') == [5, 4, 6]
+    assert await search(client, admin_access_token, q='Russia Moscow') == [5]
+    assert await search(client, admin_access_token, q='russia', limit=1) == [5]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_removed_posts_are_not_found(client, admin_access_token, post1):
+    await client.delete(
+        url=f'/posts/{post1.id}',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert await search(client, admin_access_token, q='Afghanistan') == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+@pytest.mark.parametrize('query', ['"', 'city AND (', 'NEAR(', '*', '-'])
+async def test_search_query_syntax_is_ignored(client, admin_access_token, query):
+    assert await search(client, admin_access_token, q=query) in ([], [2])
+
+
+@pytest.mark.parametrize(
+    'query, fts_query',
+    [('Real Madrid', '"Real" "Madrid"'), ('"a" OR b*', '"a" "OR" "b"'), ('?', '')],
+)
+def test_to_fts_query(query, fts_query):
+    assert to_fts_query(query) == fts_query
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_two_more_posts')
+async def test_semantic_search(mocker, client, admin_access_token):
+    mocker.patch(
+        'app.utils.ml.get_or_calculate_embedding_of_header',
+        return_value=np.array([0.0, 1.0]),
+    )
+    id2vector = {4: np.array([0.5, 1.0]), 5: np.array([1.0, 0.0])}
+    mocker.patch(
+        'app.utils.ml.get_embeddings_of_posts',
+        side_effect=lambda _, posts: [id2vector[post.id] for post in posts],
+    )
+
+    # The words alone rank the shorter header of the post 5 first
+    assert await search(client, admin_access_token, q='russia') == [5, 4]
+    assert await search(client, admin_access_token, q='russia', semantic=True) == [4, 5]
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_two_more_posts')
+async def test_semantic_search_is_not_blocked_by_writer(
+    client, session, admin_access_token
+):
+    # The posts have no stored embeddings, they are calculated without the writer
+    session.add(Post(header='header', text='text'))
+    await session.flush()
+
+    posts = await asyncio.wait_for(
+        search(client, admin_access_token, q='russia', semantic=True), timeout=5
+    )
+
+    assert sorted(posts) == [4, 5]
+    await session.rollback()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_search_index_is_rebuilt(session):
+    async with db.engine.begin() as conn:
+        await conn.exec_driver_sql('DROP TABLE PostSearch')
+        await conn.run_sync(db.create_search_index)
+
+    posts = await search_posts(session, 'football', limit=10)
+    result = await session.execute(select(Post).filter(Post.id == 2))
+    assert posts == [result.scalars().first()]
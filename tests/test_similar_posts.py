@@ -0,0 +1,162 @@
+# pylint: disable=too-many-arguments
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from app.database.models import Post, SimilarPost
+from app.run import run_periodically
+from app.utils import similar_posts
+from app.utils.cache import caches
+from app.utils.ml import get_recent_posts_index, post_index
+from app.utils.similar_posts import (
+    add_posts_to_similar_posts,
+    calculate_all_similar_posts,
+    expire_similar_posts,
+    get_similar_recent_posts,
+)
+
+
+async def get_similar_posts_rows(session):
+    result = await session.execute(
+        select(SimilarPost.post_id, SimilarPost.similar_post_id).order_by(
+            SimilarPost.post_id, SimilarPost.similar_post_id
+        )
+    )
+    return result.all()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_similar_posts_are_read_from_the_table(mocker, session, post2, post3):
+    await calculate_all_similar_posts()
+    assert await get_similar_posts_rows(session) == [
+        (post2.id, post3.id),
+        (post3.id, post2.id),
+    ]
+
+    update = mocker.spy(similar_posts, 'update_similar_posts')
+    post = await session.get(Post, post2.id)
+
+    assert [post.id for post in await get_similar_recent_posts(session, post)] == [
+        post3.id
+    ]
+    update.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_empty_lists_are_calculated_once(
+    mocker, client, admin_access_token, post1
+):
+    update = mocker.spy(similar_posts, 'update_similar_posts')
+    for _ in range(2):
+        resp = await client.get(
+            url=f'/posts/{post1.id}/similar',
+            headers={'Authorization': f'Bearer {admin_access_token}'},
+        )
+        assert resp.json() == []
+        caches['similar_posts_responses'].clear()
+
+    update.assert_called_once()
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_new_post_is_added_to_lists_of_its_neighbours(
+    session, admin, post2, post3
+):
+    await calculate_all_similar_posts()
+    post = Post(header='Real Madrid could win the Premier League', author_id=admin.id)
+    session.add(post)
+    await session.commit()
+
+    await add_posts_to_similar_posts([post.id])
+
+    rows = await get_similar_posts_rows(session)
+    assert {(post.id, post2.id), (post2.id, post.id), (post3.id, post.id)} <= set(rows)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_posts_missing_in_the_index_are_listed(session, post2, post3):
+    # The post 3 was added by another worker after this one loaded its index
+    await get_recent_posts_index(session)
+    await session.commit()
+    post_index.remove(post3.id)
+
+    await add_posts_to_similar_posts([post2.id])
+
+    assert {(post2.id, post3.id), (post3.id, post2.id)} <= set(
+        await get_similar_posts_rows(session)
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_two_more_posts')
+async def test_lists_of_removed_post_are_refilled(
+    mocker, client, session, admin, admin_access_token, post4
+):
+    mocker.patch('app.utils.similar_posts.K_NEAREST_NEIGHBOURS', 1)
+    session.add(
+        Post(id=6, header='Breaking news from Russia: Moscow City', author_id=admin.id)
+    )
+    await session.commit()
+    await calculate_all_similar_posts()
+    removed_post_id = await session.scalar(
+        select(SimilarPost.similar_post_id).filter(SimilarPost.post_id == post4.id)
+    )
+    # The index of this worker doesn't have the post, e.g. it has just been reloaded
+    post_index.clear()
+    caches['similar_posts_responses'].set(post4.id, [])
+    await session.commit()
+
+    await client.delete(
+        url=f'/posts/{removed_post_id}',
+        headers={'Authorization': f'Bearer {admin_access_token}'},
+    )
+
+    assert caches['similar_posts_responses'].get(post4.id) is None
+    assert [
+        similar_post_id
+        for post_id, similar_post_id in await get_similar_posts_rows(session)
+        if post_id == post4.id
+    ] == list({5, 6} - {removed_post_id})
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_expired_posts_are_purged(session, post2, post3):
+    await calculate_all_similar_posts()
+    post = await session.get(Post, post3.id)
+    post.posted_at = datetime.utcnow() - timedelta(weeks=2)
+    await session.commit()
+    # The index has to be reloaded to see the moved date, time can't pass here
+    post_index.clear()
+
+    await expire_similar_posts()
+
+    assert await get_similar_posts_rows(session) == []
+    # Old posts aren't materialized, their similar posts are still found on request
+    assert [post.id for post in await get_similar_recent_posts(session, post)] == [
+        post2.id
+    ]
+
+
+@pytest.mark.asyncio
+async def test_periodic_job_keeps_running_after_failures():
+    runs = []
+
+    async def job():
+        runs.append(job)
+        if len(runs) == 1:
+            raise OperationalError('DELETE', {}, Exception('database is locked'))
+
+    task = asyncio.create_task(run_periodically('test', 0, job))
+    await asyncio.sleep(0.01)
+    task.cancel()
+
+    assert len(runs) > 1
@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, inspect, select
+from sqlalchemy.exc import OperationalError
+from starlette import status
+
+from app.config import settings
+from app.database.crud_history import update_browsing_history
+from app.database.models import Post
+from app.database.redis import redis
+from app.database.sqlite import db
+from app.utils.cache import caches
+from app.utils.ml import post_index
+
+
+async def count_posts():
+    async with db.create_session(read_only=True) as session:
+        return (await session.execute(select(func.count()).select_from(Post))).scalar()
+
+
+@pytest.mark.asyncio
+async def test_engine_pragmas():
+    async with db.read_engine.connect() as conn:
+        pragmas = {
+            pragma: (await conn.exec_driver_sql(f'PRAGMA {pragma}')).scalar()
+            for pragma in ('journal_mode', 'synchronous', 'busy_timeout', 'query_only')
+        }
+
+    assert pragmas == {
+        'journal_mode': 'wal',
+        'synchronous': 1,
+        'busy_timeout': settings.sqlite_busy_timeout_ms,
+        'query_only': 1,
+    }
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_read_session_is_read_only():
+    with pytest.raises(OperationalError, match='readonly'):
+        async with db.create_session(read_only=True) as session:
+            session.add(Post(header='header', text='text'))
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_reads_are_not_blocked_by_writer(session):
+    session.add(Post(header='header', text='text'))
+    await session.flush()
+
+    # The whole read pool is used at once, while the write is not committed yet
+    counts = await asyncio.gather(
+        *[count_posts() for _ in range(settings.sqlite_read_pool_size)]
+    )
+
+    assert counts == [3] * settings.sqlite_read_pool_size
+    await session.commit()
+    assert await count_posts() == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_two_more_posts')
+async def test_recommendations_are_not_blocked_by_writer(
+    client, session, admin, admin_access_token, post4
+):
+    headers = {'Authorization': f'Bearer {admin_access_token}'}
+    # The list of similar posts is stored on the first request
+    await client.get(url=f'/posts/{post4.id}/similar', headers=headers)
+    for cache in caches.values():
+        cache.clear()
+    post_index.clear()
+    await update_browsing_history(
+        redis, admin.id, datetime.utcnow().timestamp(), post4.id
+    )
+
+    session.add(Post(header='header', text='text'))
+    await session.flush()
+    for url in ('/posts/feed', f'/posts/{post4.id}/similar'):
+        resp = await asyncio.wait_for(client.get(url=url, headers=headers), timeout=5)
+        assert resp.status_code == status.HTTP_200_OK
+    await session.rollback()
+
+
+@pytest.mark.asyncio
+async def test_missing_columns_are_created():
+    async with db.engine.begin() as conn:
+        await conn.exec_driver_sql('ALTER TABLE Post DROP COLUMN photo_hash')
+        await conn.run_sync(db.create_missing_columns)
+
+        columns = await conn.run_sync(
+            lambda sync_conn: inspect(sync_conn).get_columns('Post')
+        )
+
+    assert 'photo_hash' in [column['name'] for column in columns]
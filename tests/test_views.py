@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.database.crud_history import get_browsing_history_key
+from app.database.redis import RedisUnavailableError, redis
+from app.utils.views import ViewBuffer
+
+
+async def get_history(user_id):
+    return await redis.zrangebyscore(get_browsing_history_key(user_id))
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_flushed_right_away():
+    buffer = ViewBuffer(max_size=10, batch_size=2, flush_interval=60)
+    buffer.start()
+
+    buffer.add(user_id=1, timestamp=1.0, post_id=1)
+    await asyncio.sleep(0.01)
+    assert await get_history(1) == []
+
+    buffer.add(user_id=1, timestamp=2.0, post_id=2)
+    await asyncio.sleep(0.01)
+    assert await get_history(1) == [b'1', b'2']
+
+    await buffer.stop()
+    assert buffer.flushed == 2
+
+
+@pytest.mark.asyncio
+async def test_views_are_flushed_periodically():
+    buffer = ViewBuffer(max_size=10, batch_size=10, flush_interval=0.001)
+    buffer.start()
+
+    buffer.add(user_id=1, timestamp=1.0, post_id=1)
+    await asyncio.sleep(0.05)
+
+    assert await get_history(1) == [b'1']
+    await buffer.stop()
+
+
+@pytest.mark.asyncio
+async def test_views_are_drained_on_stop():
+    buffer = ViewBuffer(max_size=10, batch_size=2, flush_interval=60)
+    buffer.start()
+    for post_id in range(1, 4):
+        buffer.add(user_id=post_id, timestamp=1.0, post_id=post_id)
+
+    await buffer.stop()
+
+    assert len(buffer) == 0
+    assert [await get_history(user_id) for user_id in (1, 2, 3)] == [
+        [b'1'],
+        [b'2'],
+        [b'3'],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_overflowed_and_dropped_views_are_counted(mocker):
+    buffer = ViewBuffer(max_size=2, batch_size=10, flush_interval=60)
+    for post_id in range(1, 4):
+        buffer.add(user_id=1, timestamp=1.0, post_id=post_id)
+    mocker.patch(
+        'app.utils.views.update_browsing_histories', side_effect=RedisUnavailableError
+    )
+
+    await buffer.flush()
+
+    assert (buffer.flushed, buffer.overflowed, buffer.dropped) == (0, 1, 2)
+
+
+@pytest.mark.asyncio
+@pytest.mark.usefixtures('add_admin', 'add_three_posts')
+async def test_views_add_no_redis_round_trip(mocker, client, admin_access_token):
+    # Pipelines and transactions don't go through `execute` of the pool
+    spies = [
+        mocker.spy(redis.redis, method)
+        for method in ('execute', 'pipeline', 'multi_exec')
+    ]
+
+    await client.get(
+        url='/posts/1', headers={'Authorization': f'Bearer {admin_access_token}'}
+    )
+
+    assert [spy.call_count for spy in spies] == [0, 0, 0]